@@ -0,0 +1,12 @@
+import os
+
+from celery import Celery
+
+# Сигналы Celery для метрик задач должны быть подключены и в воркере, и в веб-процессе
+from config import task_metrics  # noqa: F401
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+app = Celery("config")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
@@ -0,0 +1,315 @@
+import hmac
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+from copy import deepcopy
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SLOW_QUERIES_LIMIT = 5
+SNAPSHOT_KEY = "metrics:{kind}:{process}"
+SNAPSHOT_INDEX_KEY = "metrics:{kind}:index"
+
+_current_request = ContextVar("current_request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Замеры одного запроса: SQL-запросы, время в базе и в сериализаторах."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.slow_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обертка connection.execute_wrapper: считает запросы и запоминает самые медленные."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += duration
+            self.slow_queries.append((duration, sql))
+            self.slow_queries.sort(key=lambda query: query[0], reverse=True)
+            del self.slow_queries[SLOW_QUERIES_LIMIT:]
+
+
+class PublishedRegistry:
+    """Метрики в памяти процесса, снимок которых публикуется в общий кэш.
+
+    Веб-приложение и воркеры работают в нескольких процессах, поэтому /metrics складывает
+    снимки всех процессов одного вида (kind), а не отдает метрики процесса, ответившего на запрос.
+    """
+
+    kind = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.published_at = 0.0
+
+    def snapshot(self) -> dict:
+        raise NotImplementedError
+
+    def publish(self, force: bool = False) -> None:
+        """Кладет снимок процесса в кэш не чаще METRICS_PUBLISH_INTERVAL секунд."""
+        now = time.monotonic()
+        if not force and now - self.published_at < settings.METRICS_PUBLISH_INTERVAL:
+            return
+        self.published_at = now
+        key = SNAPSHOT_KEY.format(kind=self.kind, process=f"{socket.gethostname()}-{os.getpid()}")
+        cache.set(key, self.snapshot(), timeout=settings.METRICS_SNAPSHOT_TTL)
+        # Индекс не атомарен, но каждый процесс дописывает себя при каждой публикации
+        index_key = SNAPSHOT_INDEX_KEY.format(kind=self.kind)
+        index = cache.get(index_key) or []
+        if key not in index:
+            cache.set(index_key, [*index, key], timeout=None)
+
+
+def merge(target: dict, source: dict) -> dict:
+    """Складывает снимки метрик разных процессов: числа суммируются, словари и списки - поэлементно."""
+    for key, value in source.items():
+        if key == "le":
+            target[key] = value
+        elif isinstance(value, dict):
+            merge(target.setdefault(key, {}), value)
+        elif isinstance(value, list):
+            target[key] = [a + b for a, b in zip(target.get(key, [0] * len(value)), value)]
+        else:
+            target[key] = target.get(key, 0) + value
+    return target
+
+
+def collect_snapshots(kind: str, result: dict) -> dict:
+    """Складывает в result снимки всех живых процессов вида kind, убирая из индекса истекшие."""
+    index_key = SNAPSHOT_INDEX_KEY.format(kind=kind)
+    index = cache.get(index_key) or []
+    snapshots = cache.get_many(index)
+    if len(snapshots) != len(index):
+        cache.set(index_key, [key for key in index if key in snapshots], timeout=None)
+    for snapshot in snapshots.values():
+        merge(result, snapshot)
+    return result
+
+
+class MetricsRegistry(PublishedRegistry):
+    """Агрегаты по эндпоинтам в памяти процесса, отдаются в текстовом формате Prometheus."""
+
+    kind = "http"
+
+    def __init__(self):
+        super().__init__()
+        self.endpoints = {}
+
+    def observe(self, endpoint: str, status: int, duration: float, metrics: RequestMetrics) -> None:
+        with self.lock:
+            stats = self.endpoints.setdefault(
+                endpoint,
+                {
+                    "statuses": {},
+                    "duration": new_histogram(),
+                    "db_time": 0.0,
+                    "queries": 0,
+                    "serializer_time": 0.0,
+                },
+            )
+            stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+            observe_histogram(stats["duration"], duration)
+            stats["db_time"] += metrics.db_time
+            stats["queries"] += metrics.queries
+            stats["serializer_time"] += metrics.serializer_time
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return deepcopy(self.endpoints)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.endpoints.clear()
+            self.published_at = 0.0
+
+
+registry = MetricsRegistry()
+
+
+def collect_request_metrics() -> dict:
+    """Собирает метрики запросов всех процессов веб-приложения из кэша."""
+    registry.publish(force=True)
+    return collect_snapshots(MetricsRegistry.kind, {})
+
+
+def new_histogram(buckets=DURATION_BUCKETS) -> dict:
+    """Пустая гистограмма: счетчики по корзинам (не накопленные), число и сумма наблюдений."""
+    return {"le": list(buckets), "buckets": [0] * len(buckets), "count": 0, "sum": 0.0}
+
+
+def observe_histogram(histogram: dict, value: float) -> None:
+    bucket = bisect_left(histogram["le"], value)
+    if bucket < len(histogram["buckets"]):
+        histogram["buckets"][bucket] += 1
+    histogram["count"] += 1
+    histogram["sum"] += value
+
+
+def render_histogram(lines: list[str], name: str, labels: str, histogram: dict) -> None:
+    """Добавляет строки гистограммы с накопленными корзинами, как того требует формат Prometheus."""
+    cumulative = 0
+    for le, count in zip(histogram["le"], histogram["buckets"]):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram['sum']:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {histogram['count']}")
+
+
+def render_prometheus(snapshot: dict) -> str:
+    """Формирует текстовый формат экспозиции Prometheus 0.0.4."""
+    lines = [
+        "# HELP http_requests_total Число запросов по эндпоинтам и статусам.",
+        "# TYPE http_requests_total counter",
+    ]
+    for endpoint, stats in snapshot.items():
+        for status, count in sorted(stats["statuses"].items()):
+            lines.append(f'http_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+    lines += [
+        "# HELP http_request_duration_seconds Полное время обработки запроса.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for endpoint, stats in snapshot.items():
+        render_histogram(lines, "http_request_duration_seconds", f'endpoint="{endpoint}"', stats["duration"])
+
+    for name, key, help_text in (
+        ("http_request_db_queries_total", "queries", "Число SQL-запросов."),
+        ("http_request_db_seconds_total", "db_time", "Время выполнения SQL-запросов."),
+        ("http_request_serializer_seconds_total", "serializer_time", "Время валидации и сериализации DRF."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for endpoint, stats in snapshot.items():
+            value = stats[key]
+            lines.append(f'{name}{{endpoint="{endpoint}"}} {value if isinstance(value, int) else f"{value:.6f}"}')
+    return "\n".join(lines) + "\n"
+
+
+def timed_serializer(method):
+    """Добавляет время метода сериализатора к замерам текущего запроса, не считая вложенные вызовы дважды."""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        metrics = _current_request.get()
+        if metrics is None or metrics.serializer_depth:
+            return method(self, *args, **kwargs)
+        metrics.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+            metrics.serializer_depth -= 1
+
+    return wrapper
+
+
+class TimedSerializerMixin:
+    """Учитывает время валидации и сериализации в метриках текущего запроса.
+
+    Подмешивается к сериализаторам, время которых нужно измерять; остальные сериализаторы
+    процесса не меняются.
+    """
+
+    @timed_serializer
+    def is_valid(self, *args, **kwargs):
+        return super().is_valid(*args, **kwargs)
+
+    @property
+    @timed_serializer
+    def data(self):
+        return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """Список с замером времени, для Meta.list_serializer_class."""
+
+
+class MetricsMiddleware:
+    """Замеряет число SQL-запросов, время в базе, в сериализаторах и общее время каждого запроса.
+
+    Включается настройкой METRICS_ENABLED. Медленные запросы пишутся в лог вместе с самыми
+    долгими SQL-запросами.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current_request.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current_request.reset(token)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        endpoint = f"{request.method} /{match.route}" if match else "unmatched"
+        registry.observe(endpoint, response.status_code, duration, metrics)
+        registry.publish()
+
+        if duration * 1000 >= settings.METRICS_SLOW_REQUEST_MS:
+            logger.warning(
+                "Медленный запрос %s %s: %.0f мс, SQL: %d запросов за %.0f мс, сериализаторы: %.0f мс\n%s",
+                request.method,
+                request.path,
+                duration * 1000,
+                metrics.queries,
+                metrics.db_time * 1000,
+                metrics.serializer_time * 1000,
+                "\n".join(f"  {query_time * 1000:.1f} мс: {sql}" for query_time, sql in metrics.slow_queries),
+            )
+        return response
+
+
+def is_metrics_request_allowed(request) -> bool:
+    """Пускает к метрикам по токену METRICS_TOKEN, а без него - только с локального адреса."""
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}".encode()
+        return hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected)
+    try:
+        return ipaddress.ip_address(request.META.get("REMOTE_ADDR", "")).is_loopback
+    except ValueError:
+        return False
+
+
+def metrics_view(request):
+    """Отдает агрегаты всех процессов в формате Prometheus, пока метрики включены."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if not is_metrics_request_allowed(request):
+        return HttpResponseForbidden()
+    from config.task_metrics import collect_task_metrics, render_task_metrics
+
+    content = render_prometheus(collect_request_metrics()) + render_task_metrics(collect_task_metrics())
+    return HttpResponse(content, content_type="text/plain; version=0.0.4")
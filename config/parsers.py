@@ -0,0 +1,23 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from config.renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser на orjson для тел в UTF-8, без orjson или в другой кодировке - стандартный разбор.
+
+    orjson, как и строгий режим DRF, не принимает NaN и Infinity.
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -0,0 +1,35 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson необязателен
+    orjson = None
+
+# Даты и прочие нестандартные для orjson типы сериализуются как в DRF, чтобы ответ не зависел от рендерера
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson: тот же результат, что у DRF, но кодирование в несколько раз быстрее.
+
+    Без orjson, при отступах (например, в Browsable API), ASCII-выводе или данных, которые orjson
+    не поддерживает, используется стандартный рендерер.
+    """
+
+    default = JSONEncoder().default
+
+    def can_use_orjson(self, accepted_media_type, renderer_context) -> bool:
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return False
+        return self.get_indent(accepted_media_type, renderer_context or {}) is None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not self.can_use_orjson(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и DRF, экранируем U+2028 и U+2029, чтобы ответ оставался корректным JavaScript
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
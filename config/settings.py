@@ -2,6 +2,7 @@ import os
 from datetime import timedelta
 from pathlib import Path
 
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,6 +13,12 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 
 DEBUG = os.getenv("DEBUG") == "True"
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+# Лимит Bot API ~30 сообщений/с на бота; делится поровну между процессами prefork-пула воркера,
+# при нескольких воркерах (машинах, контейнерах) лимит каждого нужно уменьшить вручную
+TELEGRAM_RATE_LIMIT = float(os.getenv("TELEGRAM_RATE_LIMIT", 30))
+TELEGRAM_CONCURRENCY = int(os.getenv("TELEGRAM_CONCURRENCY", 10))
+TELEGRAM_TIMEOUT = float(os.getenv("TELEGRAM_TIMEOUT", 10))
 
 ALLOWED_HOSTS = []
 
@@ -23,6 +30,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "drf_yasg",
@@ -33,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "config.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -83,6 +92,33 @@ DATABASES = {
     }
 }
 
+# Локальный запуск без PostgreSQL, например для нагрузочных замеров: DATABASE_ENGINE=sqlite
+if os.getenv("DATABASE_ENGINE") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+        }
+    }
+    # SQLite не поддерживает INCLUDE в индексах, покрывающий индекс там работает как обычный
+    SILENCED_SYSTEM_CHECKS = ["models.W040"]
+
+CACHE_URL = os.getenv("CACHE_URL")
+
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -113,7 +149,16 @@ MEDIA_ROOT = "media/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": ("rest_framework_simplejwt.authentication.JWTAuthentication",),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("users.authentication.CachedJWTAuthentication",),
+    "DEFAULT_RENDERER_CLASSES": (
+        "config.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "config.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
@@ -133,12 +178,52 @@ CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 AUTH_USER_MODEL = "users.User"
-# CELERY_BEAT_SCHEDULE = {
-#     "Деактивация неактивных пользователей": {
-#         "task": "users.tasks.user_active_period",
-#         "schedule": timedelta(days=1)
-#     }
-# }
+CELERY_BEAT_SCHEDULE = {
+    "Рассылка напоминаний о привычках": {
+        "task": "habits.tasks.dispatch_due_reminders",
+        "schedule": crontab(),
+    },
+    "Синхронизация расписаний напоминаний": {
+        "task": "habits.tasks.drain_schedule_outbox",
+        "schedule": crontab(),
+    },
+    "Сверка задач напоминаний с привычками": {
+        "task": "habits.tasks.reconcile_reminder_tasks",
+        "schedule": crontab(minute=30, hour=3),
+    },
+}
+
+# Режим напоминаний: "dispatcher" - одна задача beat в минуту выбирает привычки по next_fire_at,
+# "periodic_task" - отдельная PeriodicTask на каждую привычку
+HABITS_REMINDER_MODE = os.getenv("HABITS_REMINDER_MODE", "dispatcher")
+HABITS_REMINDER_CHUNK_SIZE = int(os.getenv("HABITS_REMINDER_CHUNK_SIZE", 100))
+# Напоминания сдвигаются на случайные 0..JITTER секунд после выбранного пользователем времени,
+# а диспетчер за минуту рассылает не больше MAX_PER_MINUTE (по умолчанию - минутный лимит Telegram)
+HABITS_REMINDER_JITTER = int(os.getenv("HABITS_REMINDER_JITTER", 60 * 10))
+HABITS_REMINDER_MAX_PER_MINUTE = int(os.getenv("HABITS_REMINDER_MAX_PER_MINUTE", TELEGRAM_RATE_LIMIT * 60))
+# Повторы отправки: пауза растет как BACKOFF * 2^попытка до BACKOFF_MAX секунд, затем напоминание
+# попадает в FailedReminder и может быть отправлено заново командой replay_reminders
+HABITS_REMINDER_MAX_RETRIES = int(os.getenv("HABITS_REMINDER_MAX_RETRIES", 5))
+HABITS_REMINDER_RETRY_BACKOFF = int(os.getenv("HABITS_REMINDER_RETRY_BACKOFF", 10))
+HABITS_REMINDER_RETRY_BACKOFF_MAX = int(os.getenv("HABITS_REMINDER_RETRY_BACKOFF_MAX", 60 * 10))
+HABITS_REMINDER_PAYLOAD_TTL = int(os.getenv("HABITS_REMINDER_PAYLOAD_TTL", 60 * 60 * 24))
+# Размер пачки при разборе outbox расписаний в режиме periodic_task
+HABITS_SCHEDULE_OUTBOX_BATCH = int(os.getenv("HABITS_SCHEDULE_OUTBOX_BATCH", 500))
+HABITS_PUBLIC_FEED_CACHE_TTL = int(os.getenv("HABITS_PUBLIC_FEED_CACHE_TTL", 60 * 5))
+# Метрики запросов в формате Prometheus (/metrics) и лог медленных запросов
+METRICS_ENABLED = os.getenv("METRICS_ENABLED") == "True"
+METRICS_SLOW_REQUEST_MS = int(os.getenv("METRICS_SLOW_REQUEST_MS", 500))
+# /metrics отдается по заголовку "Authorization: Bearer <METRICS_TOKEN>", без токена - только локальным клиентам
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Процессы веб-приложения и воркеры Celery публикуют свои метрики в общий кэш, откуда их отдает /metrics
+METRICS_PUBLISH_INTERVAL = int(os.getenv("METRICS_PUBLISH_INTERVAL", 10))
+METRICS_SNAPSHOT_TTL = int(os.getenv("METRICS_SNAPSHOT_TTL", 60 * 5))
+
+# Время жизни полей пользователя для JWT-аутентификации в общем кэше и в памяти процесса, секунды
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", 60 * 5))
+AUTH_USER_LOCAL_CACHE_TTL = int(os.getenv("AUTH_USER_LOCAL_CACHE_TTL", 10))
+
+HABITS_BULK_MAX_SIZE = int(os.getenv("HABITS_BULK_MAX_SIZE", 500))
 
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", 5312))
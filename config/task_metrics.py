@@ -0,0 +1,149 @@
+import time
+from copy import deepcopy
+
+from celery.signals import before_task_publish, task_postrun, task_prerun, task_retry, worker_process_shutdown
+from django.conf import settings
+
+from config.metrics import PublishedRegistry, collect_snapshots, new_histogram, observe_histogram, render_histogram
+
+QUEUE_LAG_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600)
+
+
+class TaskMetricsRegistry(PublishedRegistry):
+    """Метрики задач Celery и запросов к Telegram в памяти процесса воркера.
+
+    Воркеры работают в отдельных процессах, поэтому снимок периодически публикуется в общий кэш,
+    откуда его забирает эндпоинт /metrics веб-приложения.
+    """
+
+    kind = "tasks"
+
+    def __init__(self):
+        super().__init__()
+        self.tasks = {}
+        self.telegram = {"statuses": {}, "duration": new_histogram()}
+
+    def get_task(self, name: str) -> dict:
+        return self.tasks.setdefault(
+            name,
+            {
+                "states": {},
+                "retries": 0,
+                "queue_lag": new_histogram(QUEUE_LAG_BUCKETS),
+                "runtime": new_histogram(),
+            },
+        )
+
+    def observe_start(self, name: str, queue_lag: float | None) -> None:
+        if queue_lag is None:
+            return
+        with self.lock:
+            observe_histogram(self.get_task(name)["queue_lag"], max(queue_lag, 0.0))
+
+    def observe_finish(self, name: str, state: str, runtime: float) -> None:
+        with self.lock:
+            task = self.get_task(name)
+            task["states"][state] = task["states"].get(state, 0) + 1
+            observe_histogram(task["runtime"], runtime)
+
+    def observe_retry(self, name: str) -> None:
+        with self.lock:
+            self.get_task(name)["retries"] += 1
+
+    def observe_telegram(self, status: str, duration: float) -> None:
+        with self.lock:
+            statuses = self.telegram["statuses"]
+            statuses[status] = statuses.get(status, 0) + 1
+            observe_histogram(self.telegram["duration"], duration)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"tasks": deepcopy(self.tasks), "telegram": deepcopy(self.telegram)}
+
+    def clear(self) -> None:
+        with self.lock:
+            self.tasks.clear()
+            self.telegram = {"statuses": {}, "duration": new_histogram()}
+            self.published_at = 0.0
+
+
+task_registry = TaskMetricsRegistry()
+
+
+def collect_task_metrics() -> dict:
+    """Собирает снимки всех живых процессов воркеров из кэша."""
+    return collect_snapshots(
+        TaskMetricsRegistry.kind, {"tasks": {}, "telegram": {"statuses": {}, "duration": new_histogram()}}
+    )
+
+
+def render_task_metrics(snapshot: dict) -> str:
+    """Формирует метрики задач и Telegram в текстовом формате Prometheus."""
+    tasks = snapshot["tasks"]
+    lines = ["# HELP celery_tasks_total Число выполненных задач по состояниям.", "# TYPE celery_tasks_total counter"]
+    for name, task in tasks.items():
+        for state, count in sorted(task["states"].items()):
+            lines.append(f'celery_tasks_total{{task="{name}",state="{state}"}} {count}')
+
+    lines += ["# HELP celery_task_retries_total Число повторов задач.", "# TYPE celery_task_retries_total counter"]
+    for name, task in tasks.items():
+        lines.append(f'celery_task_retries_total{{task="{name}"}} {task["retries"]}')
+
+    for metric, key, help_text in (
+        ("celery_task_queue_lag_seconds", "queue_lag", "Время от постановки задачи в очередь до начала выполнения."),
+        ("celery_task_runtime_seconds", "runtime", "Время выполнения задачи."),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+        for name, task in tasks.items():
+            render_histogram(lines, metric, f'task="{name}"', task[key])
+
+    telegram = snapshot["telegram"]
+    lines += [
+        "# HELP telegram_requests_total Запросы к Bot API по HTTP-статусам.",
+        "# TYPE telegram_requests_total counter",
+    ]
+    for status, count in sorted(telegram["statuses"].items()):
+        lines.append(f'telegram_requests_total{{status="{status}"}} {count}')
+    lines += [
+        "# HELP telegram_request_duration_seconds Время запроса к Bot API.",
+        "# TYPE telegram_request_duration_seconds histogram",
+    ]
+    render_histogram(lines, "telegram_request_duration_seconds", 'method="sendMessage"', telegram["duration"])
+    return "\n".join(lines) + "\n"
+
+
+@before_task_publish.connect
+def mark_enqueued_at(headers=None, **kwargs):
+    """Добавляет в заголовки сообщения время постановки в очередь, чтобы воркер посчитал задержку."""
+    if headers is not None and settings.METRICS_ENABLED:
+        headers["enqueued_at"] = time.time()
+
+
+@task_prerun.connect
+def observe_task_start(task=None, **kwargs):
+    if not settings.METRICS_ENABLED:
+        return
+    enqueued_at = getattr(task.request, "enqueued_at", None)
+    task.request.metrics_started_at = time.perf_counter()
+    task_registry.observe_start(task.name, time.time() - enqueued_at if enqueued_at else None)
+
+
+@task_postrun.connect
+def observe_task_finish(task=None, state=None, **kwargs):
+    started_at = getattr(task.request, "metrics_started_at", None)
+    if not settings.METRICS_ENABLED or started_at is None:
+        return
+    task_registry.observe_finish(task.name, state or "UNKNOWN", time.perf_counter() - started_at)
+    task_registry.publish()
+
+
+@task_retry.connect
+def observe_task_retry(sender=None, **kwargs):
+    if settings.METRICS_ENABLED:
+        task_registry.observe_retry(sender.name)
+
+
+@worker_process_shutdown.connect
+def publish_on_shutdown(**kwargs):
+    if settings.METRICS_ENABLED:
+        task_registry.publish(force=True)
@@ -4,6 +4,8 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from config.metrics import metrics_view
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Atomic Habits API",
@@ -23,5 +25,6 @@ urlpatterns = [
     path("users/", include("users.urls")),
     path("swagger<format>/", schema_view.without_ui(cache_timeout=0), name="schema-json"),
     path("swagger/", schema_view.with_ui("swagger", cache_timeout=0), name="schema-swagger-ui"),
+    path("metrics", metrics_view, name="metrics"),
     path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
 ]
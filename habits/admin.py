@@ -1,8 +1,13 @@
 from django.contrib import admin
 
-from habits.models import Habits
+from habits.models import FailedReminder, Habits
 
 
 @admin.register(Habits)
 class HabitsAdmin(admin.ModelAdmin):
     list_display = [f.name for f in Habits._meta.fields]
+
+
+@admin.register(FailedReminder)
+class FailedReminderAdmin(admin.ModelAdmin):
+    list_display = ["habit", "status_code", "error", "attempts", "created_at"]
@@ -0,0 +1,216 @@
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.renderers import ORJSONRenderer
+from habits.models import Habits
+from habits.seeding import seed_habits, seed_users
+from habits.serializers import HabitsSerializer, HabitValuesSerializer, get_readable_fields
+from habits.services import clear_schedule_cache
+from habits.tasks import send_messages_bulk
+from users.models import User
+
+WORKLOADS = (
+    "habit-create",
+    "habit-list",
+    "public-habit-list",
+    "habit-update",
+    "send-message",
+    "render-json",
+    "render-orjson",
+)
+# Размер страницы для замеров кодирования JSON
+RENDER_PAGE_SIZE = 100
+PERCENTILES = (50, 95, 99)
+
+
+class TelegramStubHandler(BaseHTTPRequestHandler):
+    """Локальная заглушка Bot API, чтобы замеры рассылки не зависели от сети."""
+
+    # keep-alive, как у настоящего Bot API, иначе замер упирается в установку соединений
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        body = b'{"ok": true, "result": {}}'
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(values: list[float], p: int) -> float:
+    """Возвращает перцентиль p методом ближайшего ранга."""
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Сравнивает отчет с базовым и возвращает описания регрессий.
+
+    Задержка считается регрессией, если превышает базовую больше чем на tolerance,
+    число запросов к базе детерминировано и не должно расти вовсе.
+    """
+    regressions = []
+    for name, result in report.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {result[key]:.2f} > {base[key]:.2f}")
+        if result["queries"] > base["queries"] + 0.01:
+            regressions.append(f"{name}: queries {result['queries']:.2f} > {base['queries']:.2f}")
+    return regressions
+
+
+class HabitsBenchmark:
+    """Сценарии нагрузки на API привычек и рассылку напоминаний.
+
+    Запросы выполняются в процессе через APIClient с JWT, как у настоящих клиентов,
+    рассылка идет в локальную заглушку Telegram. Для каждого сценария считаются
+    перцентили задержки, среднее число SQL-запросов и пропускная способность.
+    """
+
+    def __init__(self, users=100, habits=1000, requests=200, seed=0, warmup=10, workloads=WORKLOADS):
+        self.users_count = users
+        self.habits_count = habits
+        self.requests = requests
+        self.warmup = warmup
+        self.workloads = workloads
+        self.random_seed = seed
+        self.random = random.Random(seed)
+
+    def seed(self) -> None:
+        """Засевает базу тем же генератором, что и команда seed_habits, и готовит клиентов с JWT."""
+        user_pks = seed_users(self.users_count, seed=self.random_seed)
+        seed_habits(user_pks, self.habits_count, seed=self.random_seed)
+        users = list(User.objects.filter(pk__range=(user_pks.start, user_pks.stop - 1)).order_by("pk"))
+
+        self.clients = []
+        for user in users:
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+            self.clients.append(client)
+        self.useful_habits = list(Habits.objects.filter(is_pleasant=False).values_list("pk", "user_id"))
+        chat_users = {user.pk for user in users if user.chat_id}
+        self.reminder_pks = [pk for pk, user_id in self.useful_habits if user_id in chat_users]
+        self.user_index = {user.pk: index for index, user in enumerate(users)}
+        self.next_links = {}
+        rows = Habits.objects.values(*get_readable_fields(HabitsSerializer))[:RENDER_PAGE_SIZE]
+        self.render_data = {"next": None, "previous": None, "results": HabitValuesSerializer(rows, many=True).data}
+
+    def get_client(self) -> APIClient:
+        return self.clients[self.random.randrange(len(self.clients))]
+
+    def follow(self, name: str, client: APIClient, url: str):
+        """Листает список по ссылкам next, начиная сначала после последней страницы."""
+        response = client.get(self.next_links.get((name, id(client))) or url)
+        self.next_links[(name, id(client))] = response.json().get("next")
+        return response
+
+    def habit_create(self):
+        return self.get_client().post(
+            reverse("habits:habit-create"),
+            {"place": "Дом", "action": "Читать", "period": Habits.DAILY, "reward": "Чай"},
+            format="json",
+        )
+
+    def habit_list(self):
+        return self.follow("habit-list", self.get_client(), reverse("habits:habit-list"))
+
+    def public_habit_list(self):
+        return self.follow("public-habit-list", self.get_client(), reverse("habits:public-habit-list"))
+
+    def habit_update(self):
+        pk, user_id = self.useful_habits[self.random.randrange(len(self.useful_habits))]
+        return self.clients[self.user_index[user_id]].patch(
+            reverse("habits:habit-update", args=(pk,)), {"place": f"Место {self.random.random()}"}, format="json"
+        )
+
+    def send_message(self):
+        size = settings.HABITS_REMINDER_CHUNK_SIZE
+        start = self.random.randrange(max(1, len(self.reminder_pks) - size))
+        end = start + size
+        return send_messages_bulk(self.reminder_pks[start:end])
+
+    def render_json(self):
+        return HttpResponse(JSONRenderer().render(self.render_data))
+
+    def render_orjson(self):
+        return HttpResponse(ORJSONRenderer().render(self.render_data))
+
+    def measure(self, func) -> dict:
+        """Выполняет сценарий requests раз после прогрева и собирает статистику."""
+        for _ in range(self.warmup):
+            func()
+
+        latencies, queries, size = [], 0, 0
+        started = time.perf_counter()
+        for _ in range(self.requests):
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                response = func()
+                latencies.append((time.perf_counter() - request_started) * 1000)
+            if getattr(response, "status_code", 200) >= 400:
+                raise RuntimeError(f"Сценарий {func.__name__} вернул {response.status_code}: {response.content!r}")
+            queries += len(captured)
+            size += len(getattr(response, "content", b""))
+        elapsed = time.perf_counter() - started
+
+        result = {f"p{p}_ms": round(percentile(latencies, p), 3) for p in PERCENTILES}
+        result["queries"] = round(queries / self.requests, 2)
+        result["rps"] = round(self.requests / elapsed, 1)
+        result["mb_per_s"] = round(size / elapsed / 2**20, 2)
+        return result
+
+    def run(self) -> dict[str, dict]:
+        """Засевает базу и прогоняет выбранные сценарии, возвращает отчет по каждому."""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), TelegramStubHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        overrides = override_settings(
+            TELEGRAM_API_URL=f"http://127.0.0.1:{server.server_port}",
+            TELEGRAM_RATE_LIMIT=10**6,
+            # Отдельный префикс, чтобы прогон начинался с холодного кэша и не трогал чужие ключи
+            CACHES={
+                alias: {**config, "KEY_PREFIX": f"benchmark-{time.time_ns()}"}
+                for alias, config in settings.CACHES.items()
+            },
+        )
+        try:
+            with overrides:
+                clear_schedule_cache()
+                self.seed()
+                return {name: self.measure(getattr(self, name.replace("-", "_"))) for name in self.workloads}
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def load_baseline(path) -> dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_baseline(path, report: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
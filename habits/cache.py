@@ -0,0 +1,98 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+from habits.models import Habits
+
+REMINDER_PAYLOAD_KEY = "habits:reminder:{pk}"
+PUBLIC_FEED_VERSION_KEY = "habits:public-feed:version"
+PUBLIC_FEED_PAGE_KEY = "habits:public-feed:{version}:{digest}"
+
+
+def get_reminder_text(habit: Habits) -> str:
+    """Формирует текст напоминания о привычке."""
+    return (
+        f"Время для {habit.action} в {habit.place}! "
+        f"Не забудьте {habit.reward if habit.reward else habit.related_habit}."
+    )
+
+
+def build_reminder_payload(habit: Habits) -> dict:
+    """Собирает данные для отправки напоминания: чат пользователя и готовый текст."""
+    return {"chat_id": habit.user.chat_id, "text": get_reminder_text(habit)}
+
+
+def set_reminder_payloads(habits) -> None:
+    """Обновляет закэшированные данные напоминаний о полезных привычках."""
+    cache.set_many(
+        {
+            REMINDER_PAYLOAD_KEY.format(pk=habit.pk): build_reminder_payload(habit)
+            for habit in habits
+            if not habit.is_pleasant
+        },
+        timeout=settings.HABITS_REMINDER_PAYLOAD_TTL,
+    )
+
+
+def delete_reminder_payloads(pks) -> None:
+    """Удаляет данные напоминаний из кэша, они будут пересобраны при следующей отправке."""
+    cache.delete_many([REMINDER_PAYLOAD_KEY.format(pk=pk) for pk in pks])
+
+
+def refresh_reminder_payloads(habits, created: bool = False) -> None:
+    """Обновляет данные напоминаний привычек и сбрасывает их у привычек, текст которых упоминает эти."""
+    set_reminder_payloads(habits)
+    if not created:
+        delete_reminder_payloads(
+            Habits.objects.filter(related_habit__in=[habit.pk for habit in habits]).values_list("pk", flat=True)
+        )
+
+
+def get_reminder_payloads(pks) -> dict[int, dict]:
+    """Возвращает данные напоминаний для пачки привычек.
+
+    Промахи кэша догружаются одним запросом с select_related и сразу кэшируются,
+    удаленные привычки в результат не попадают.
+    """
+    keys = {REMINDER_PAYLOAD_KEY.format(pk=pk): pk for pk in pks}
+    payloads = {keys[key]: payload for key, payload in cache.get_many(keys).items()}
+
+    missing = [pk for pk in pks if pk not in payloads]
+    if missing:
+        habits = Habits.objects.filter(pk__in=missing).select_related("user", "related_habit")
+        fresh = {habit.pk: build_reminder_payload(habit) for habit in habits}
+        cache.set_many(
+            {REMINDER_PAYLOAD_KEY.format(pk=pk): payload for pk, payload in fresh.items()},
+            timeout=settings.HABITS_REMINDER_PAYLOAD_TTL,
+        )
+        payloads.update(fresh)
+
+    return payloads
+
+
+def get_public_feed_key(request) -> str:
+    """Возвращает ключ страницы публичной ленты для текущей версии и параметров запроса."""
+    version = cache.get(PUBLIC_FEED_VERSION_KEY)
+    if version is None:
+        cache.add(PUBLIC_FEED_VERSION_KEY, 1, timeout=None)
+        version = cache.get(PUBLIC_FEED_VERSION_KEY, 1)
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    digest = hashlib.md5(f"{request.get_host()}?{query}".encode()).hexdigest()
+    return PUBLIC_FEED_PAGE_KEY.format(version=version, digest=digest)
+
+
+def set_public_feed_page(key: str, content: bytes) -> tuple[str, bytes]:
+    """Кэширует сериализованную страницу публичной ленты вместе с ее ETag."""
+    page = (f'"{hashlib.md5(content).hexdigest()}"', content)
+    cache.set(key, page, timeout=settings.HABITS_PUBLIC_FEED_CACHE_TTL)
+    return page
+
+
+def invalidate_public_feed() -> None:
+    """Сбрасывает все закэшированные страницы публичной ленты сменой версии."""
+    try:
+        cache.incr(PUBLIC_FEED_VERSION_KEY)
+    except ValueError:
+        cache.add(PUBLIC_FEED_VERSION_KEY, 1, timeout=None)
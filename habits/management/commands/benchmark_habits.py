@@ -0,0 +1,67 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from habits.benchmarks import WORKLOADS, HabitsBenchmark, compare, load_baseline, save_baseline
+
+
+class Command(BaseCommand):
+    help = "Нагрузочные замеры API привычек и рассылки напоминаний на отдельной тестовой базе"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100, help="Число пользователей в засеянной базе")
+        parser.add_argument("--habits", type=int, default=2000, help="Число привычек в засеянной базе")
+        parser.add_argument("--requests", type=int, default=200, help="Число замеров на сценарий")
+        parser.add_argument("--seed", type=int, default=0, help="Зерно генератора для воспроизводимости")
+        parser.add_argument("--workload", action="append", choices=WORKLOADS, help="Сценарий, можно несколько")
+        parser.add_argument("--baseline", type=Path, help="Файл базовых замеров (по умолчанию для текущей СУБД)")
+        parser.add_argument("--save-baseline", action="store_true", help="Сохранить результат как базовый")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="Допустимый рост задержки, доля")
+        parser.add_argument("--json", action="store_true", help="Вывести отчет в формате JSON")
+
+    def handle(self, *args, **options):
+        baseline_path = options["baseline"] or settings.BASE_DIR / "benchmarks" / f"baseline-{connection.vendor}.json"
+        benchmark = HabitsBenchmark(
+            users=options["users"],
+            habits=options["habits"],
+            requests=options["requests"],
+            seed=options["seed"],
+            workloads=options["workload"] or WORKLOADS,
+        )
+
+        # Замеры идут на отдельной тестовой базе, рабочие данные не затрагиваются
+        old_name = connection.settings_dict["NAME"]
+        setup_test_environment(debug=False)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = benchmark.run()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(
+                f"{'сценарий':<20}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'SQL':>8}{'rps':>10}{'МБ/с':>10}"
+            )
+            for name, result in report.items():
+                self.stdout.write(
+                    f"{name:<20}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                    f"{result['queries']:>8.2f}{result['rps']:>10.1f}{result.get('mb_per_s', 0):>10.2f}"
+                )
+
+        if options["save_baseline"]:
+            save_baseline(baseline_path, report)
+            self.stdout.write(self.style.SUCCESS(f"Базовые замеры сохранены в {baseline_path}"))
+        elif baseline_path.exists():
+            regressions = compare(report, load_baseline(baseline_path), options["tolerance"])
+            if regressions:
+                raise CommandError("Регрессия производительности:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS(f"Регрессий относительно {baseline_path} нет"))
+        else:
+            self.stdout.write(f"Базовых замеров {baseline_path} нет, сохраните их с --save-baseline")
@@ -0,0 +1,23 @@
+from django.core.management import BaseCommand
+
+from habits.services import reconcile_tasks
+
+
+class Command(BaseCommand):
+    help = "Удаляет задачи напоминаний django_celery_beat без привычек и создает недостающие"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Размер пачки создаваемых задач")
+
+    def handle(self, *args, **options):
+        result = reconcile_tasks(options["batch_size"])
+        before, after = result["tasks_before"], result["tasks_after"]
+        change = (after - before) / before * 100 if before else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Удалено задач без привычек: {result['deleted']}, создано недостающих: {result['created']}. "
+                f"Задач у beat: {before} -> {after} ({change:+.1f}%)"
+            )
+        )
+        if result["scheduled"]:
+            self.stdout.write(self.style.SUCCESS(f"Назначено напоминаний диспетчера: {result['scheduled']}"))
@@ -0,0 +1,42 @@
+from itertools import islice
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from habits.models import FailedReminder
+from habits.tasks import send_messages_bulk
+
+
+class Command(BaseCommand):
+    help = "Повторно отправляет неотправленные напоминания пачками, растягивая отправку во времени"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, help="Сколько неотправленных напоминаний взять (по умолчанию все)")
+        parser.add_argument(
+            "--rate",
+            type=float,
+            help="Сообщений в секунду (по умолчанию TELEGRAM_RATE_LIMIT), чтобы не создать всплеск",
+        )
+
+    def handle(self, *args, **options):
+        rate = options["rate"] or settings.TELEGRAM_RATE_LIMIT
+        size = settings.HABITS_REMINDER_CHUNK_SIZE
+
+        with transaction.atomic():
+            rows = FailedReminder.objects.select_for_update(skip_locked=True).order_by("pk")[: options["limit"]]
+            rows = list(rows.values_list("pk", "habit_id"))
+            FailedReminder.objects.filter(pk__in=[pk for pk, habit_id in rows]).delete()
+            # Одна привычка могла упасть несколько раз, напоминание о ней нужно отправить один раз
+            iterator = iter(dict.fromkeys(habit_id for pk, habit_id in rows))
+            chunks = list(iter(lambda: list(islice(iterator, size)), []))
+
+            def enqueue():
+                for index, chunk in enumerate(chunks):
+                    send_messages_bulk.apply_async((chunk,), countdown=index * size / rate)
+
+            # Задачи ставятся после фиксации удаления, чтобы при откате напоминания не ушли дважды
+            transaction.on_commit(enqueue)
+
+        count = sum(len(chunk) for chunk in chunks)
+        self.stdout.write(self.style.SUCCESS(f"Поставлено в очередь напоминаний: {count}, пачек: {len(chunks)}"))
@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from habits.services import schedule_reminders
+
+
+class Command(BaseCommand):
+    help = "Назначает время напоминания привычкам без next_fire_at при переходе в режим диспетчера"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Размер пачки обновляемых привычек")
+
+    def handle(self, *args, **options):
+        scheduled = schedule_reminders(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Назначено напоминаний: {scheduled}"))
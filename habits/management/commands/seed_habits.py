@@ -0,0 +1,28 @@
+import time
+
+from django.core.management import BaseCommand
+
+from habits.seeding import SEED_PASSWORD, seed_habits, seed_users
+
+
+class Command(BaseCommand):
+    help = "Быстро засеивает базу пользователями и привычками для нагрузочного тестирования"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Число пользователей")
+        parser.add_argument("--habits", type=int, default=10000, help="Число привычек")
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Зерно генератора: одинаковое зерно дает одинаковые данные"
+        )
+        parser.add_argument("--batch-size", type=int, default=10000, help="Размер пачки при загрузке")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        user_pks = seed_users(options["users"], seed=options["seed"], batch_size=options["batch_size"])
+        self.stdout.write(f"Создано пользователей: {len(user_pks)} за {time.perf_counter() - started:.1f} с")
+
+        started = time.perf_counter()
+        habit_pks = seed_habits(user_pks, options["habits"], seed=options["seed"], batch_size=options["batch_size"])
+        self.stdout.write(f"Создано привычек: {len(habit_pks)} за {time.perf_counter() - started:.1f} с")
+
+        self.stdout.write(self.style.SUCCESS(f"Засеивание завершено, пароль пользователей: {SEED_PASSWORD}"))
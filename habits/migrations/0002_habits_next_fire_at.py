@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habits",
+            name="next_fire_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                help_text="Время ближайшей отправки напоминания диспетчером",
+                null=True,
+                verbose_name="Следующее напоминание",
+            ),
+        ),
+    ]
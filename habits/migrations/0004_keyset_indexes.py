@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0003_list_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="habits",
+            name="habits_user_created_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="habits",
+            name="habits_public_created_idx",
+        ),
+        migrations.AddIndex(
+            model_name="habits",
+            index=models.Index(fields=["user", "-created_at", "-id"], name="habits_user_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="habits",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["-created_at", "-id"],
+                include=("action", "is_pleasant", "max_time_processing"),
+                name="habits_public_created_idx",
+            ),
+        ),
+    ]
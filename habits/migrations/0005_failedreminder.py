@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0004_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FailedReminder",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "status_code",
+                    models.PositiveIntegerField(blank=True, null=True, verbose_name="HTTP-статус ответа Telegram"),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Ошибка")),
+                ("attempts", models.PositiveIntegerField(default=1, verbose_name="Число попыток")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Дата ошибки")),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="failed_reminders",
+                        to="habits.habits",
+                        verbose_name="Привычка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Неотправленное напоминание",
+                "verbose_name_plural": "Неотправленные напоминания",
+                "ordering": ["created_at"],
+            },
+        ),
+    ]
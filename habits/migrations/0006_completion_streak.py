@@ -0,0 +1,67 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0005_failedreminder"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HabitStreak",
+            fields=[
+                (
+                    "habit",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="streak",
+                        serialize=False,
+                        to="habits.habits",
+                        verbose_name="Привычка",
+                    ),
+                ),
+                ("started_on", models.DateField(verbose_name="Начало отсчета периодов")),
+                ("last_completed_on", models.DateField(blank=True, null=True, verbose_name="Последнее выполнение")),
+                ("current_streak", models.PositiveIntegerField(default=0, verbose_name="Текущая серия")),
+                ("longest_streak", models.PositiveIntegerField(default=0, verbose_name="Самая длинная серия")),
+                ("completed_periods", models.PositiveIntegerField(default=0, verbose_name="Периодов с выполнением")),
+            ],
+            options={
+                "verbose_name": "Серия выполнения привычки",
+                "verbose_name_plural": "Серии выполнения привычек",
+            },
+        ),
+        migrations.CreateModel(
+            name="HabitCompletion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "completed_on",
+                    models.DateField(help_text="Дата в часовом поясе пользователя", verbose_name="Дата выполнения"),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Дата отметки")),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="completions",
+                        to="habits.habits",
+                        verbose_name="Привычка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Выполнение привычки",
+                "verbose_name_plural": "Выполнения привычек",
+                "ordering": ["-completed_on"],
+                "constraints": [
+                    models.UniqueConstraint(fields=("habit", "completed_on"), name="habits_completion_unique_day")
+                ],
+            },
+        ),
+    ]
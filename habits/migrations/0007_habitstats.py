@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0006_completion_streak"),
+        ("users", "0002_reminder_time_zone"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HabitStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="habit_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+                ("total", models.IntegerField(default=0, verbose_name="Всего привычек")),
+                ("pleasant", models.IntegerField(default=0, verbose_name="Приятных привычек")),
+                ("public", models.IntegerField(default=0, verbose_name="Публичных привычек")),
+                ("daily", models.IntegerField(default=0, verbose_name="Ежедневных привычек")),
+                ("weekly", models.IntegerField(default=0, verbose_name="Еженедельных привычек")),
+                ("monthly", models.IntegerField(default=0, verbose_name="Ежемесячных привычек")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="Дата обновления")),
+            ],
+            options={
+                "verbose_name": "Статистика привычек",
+                "verbose_name_plural": "Статистика привычек",
+            },
+        ),
+    ]
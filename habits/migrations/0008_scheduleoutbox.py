@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0007_habitstats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduleOutbox",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("habit_id", models.BigIntegerField(verbose_name="id привычки")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Дата изменения")),
+            ],
+            options={
+                "verbose_name": "Изменение расписания",
+                "verbose_name_plural": "Изменения расписаний",
+                "ordering": ["pk"],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# Индексы поиска только для PostgreSQL, поэтому они не описаны в модели и не попадают в ее состояние:
+# SQLite не умеет GIN и при перестройке таблицы пытался бы их создать
+SEARCH_INDEXES = (
+    GinIndex(SearchVector("action", "place", config="russian"), name="habits_search_idx"),
+    GinIndex(fields=["action", "place"], opclasses=["gin_trgm_ops", "gin_trgm_ops"], name="habits_trgm_idx"),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    habits = apps.get_model("habits", "Habits")
+    for index in SEARCH_INDEXES:
+        schema_editor.add_index(habits, index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    habits = apps.get_model("habits", "Habits")
+    for index in SEARCH_INDEXES:
+        schema_editor.remove_index(habits, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0008_scheduleoutbox"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
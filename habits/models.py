@@ -43,13 +43,180 @@ class Habits(models.Model):
         help_text="Максимальное время на выполнение в секундах",
     )
     is_public = models.BooleanField(verbose_name="Признак публичности", default=False)
+    next_fire_at = models.DateTimeField(
+        verbose_name="Следующее напоминание",
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Время ближайшей отправки напоминания диспетчером",
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
     def __str__(self):
         return f"{self.action} в {self.place}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Значения на момент загрузки нужны, чтобы при сохранении знать, какие поля изменились
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def has_changed(self, *fields) -> bool:
+        """Проверяет, изменилось ли хотя бы одно из полей с момента загрузки из БД.
+
+        Для новых объектов и не загруженных (отложенных) полей возвращает True.
+        """
+        loaded_values = getattr(self, "_loaded_values", None)
+        if loaded_values is None:
+            return True
+        for field in fields:
+            attname = self._meta.get_field(field).attname
+            if attname not in loaded_values or loaded_values[attname] != getattr(self, attname):
+                return True
+        return False
+
     class Meta:
         verbose_name = "Привычка"
         verbose_name_plural = "Привычки"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="habits_user_created_idx"),
+            models.Index(
+                fields=["-created_at", "-id"],
+                include=["action", "is_pleasant", "max_time_processing"],
+                condition=models.Q(is_public=True),
+                name="habits_public_created_idx",
+            ),
+        ]
+
+
+class FailedReminder(models.Model):
+    """Напоминание, которое не удалось отправить после всех повторов (dead letter)."""
+
+    habit = models.ForeignKey(
+        Habits, on_delete=models.CASCADE, verbose_name="Привычка", related_name="failed_reminders"
+    )
+    status_code = models.PositiveIntegerField(verbose_name="HTTP-статус ответа Telegram", null=True, blank=True)
+    error = models.TextField(verbose_name="Ошибка", blank=True)
+    attempts = models.PositiveIntegerField(verbose_name="Число попыток", default=1)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата ошибки")
+
+    def __str__(self):
+        return f"Напоминание о привычке {self.habit_id}: {self.status_code or self.error}"
+
+    class Meta:
+        verbose_name = "Неотправленное напоминание"
+        verbose_name_plural = "Неотправленные напоминания"
+        ordering = ["created_at"]
+
+
+class HabitCompletion(models.Model):
+    """Запись о выполнении привычки. Журнал только дополняется, по одной записи на день."""
+
+    habit = models.ForeignKey(Habits, on_delete=models.CASCADE, verbose_name="Привычка", related_name="completions")
+    completed_on = models.DateField(verbose_name="Дата выполнения", help_text="Дата в часовом поясе пользователя")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата отметки")
+
+    def __str__(self):
+        return f"{self.habit_id} выполнена {self.completed_on}"
+
+    class Meta:
+        verbose_name = "Выполнение привычки"
+        verbose_name_plural = "Выполнения привычек"
+        ordering = ["-completed_on"]
+        constraints = [
+            models.UniqueConstraint(fields=["habit", "completed_on"], name="habits_completion_unique_day"),
+        ]
+
+
+class HabitStreak(models.Model):
+    """Агрегаты выполнения привычки, обновляются при каждой отметке, чтобы не сканировать журнал.
+
+    Выполнения считаются по периодам привычки, отсчитанным от даты первой отметки:
+    серия продолжается, если привычка выполнена в каждом следующем периоде.
+    """
+
+    habit = models.OneToOneField(
+        Habits, on_delete=models.CASCADE, primary_key=True, verbose_name="Привычка", related_name="streak"
+    )
+    started_on = models.DateField(verbose_name="Начало отсчета периодов")
+    last_completed_on = models.DateField(verbose_name="Последнее выполнение", null=True, blank=True)
+    current_streak = models.PositiveIntegerField(verbose_name="Текущая серия", default=0)
+    longest_streak = models.PositiveIntegerField(verbose_name="Самая длинная серия", default=0)
+    completed_periods = models.PositiveIntegerField(verbose_name="Периодов с выполнением", default=0)
+
+    class Meta:
+        verbose_name = "Серия выполнения привычки"
+        verbose_name_plural = "Серии выполнения привычек"
+
+    def get_period_index(self, day, period: int) -> int:
+        return (day - self.started_on).days // period
+
+    def get_current_streak(self, today, period: int) -> int:
+        """Серия на сегодня: обнуляется, если пропущен целый период после последнего выполнения."""
+        if self.last_completed_on is None:
+            return 0
+        if self.get_period_index(today, period) - self.get_period_index(self.last_completed_on, period) > 1:
+            return 0
+        return self.current_streak
+
+    def get_completion_rate(self, today, period: int) -> float:
+        """Доля периодов с выполнением среди прошедших с начала отсчета."""
+        return round(self.completed_periods / (self.get_period_index(today, period) + 1), 4)
+
+
+class HabitStats(models.Model):
+    """Счетчики привычек пользователя по видам и периодичности.
+
+    Поддерживаются приращениями при сохранении и удалении привычек, поэтому статистика
+    читается одной строкой по первичному ключу, сколько бы привычек ни было у пользователя.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, verbose_name="Пользователь", related_name="habit_stats"
+    )
+    total = models.IntegerField(verbose_name="Всего привычек", default=0)
+    pleasant = models.IntegerField(verbose_name="Приятных привычек", default=0)
+    public = models.IntegerField(verbose_name="Публичных привычек", default=0)
+    daily = models.IntegerField(verbose_name="Ежедневных привычек", default=0)
+    weekly = models.IntegerField(verbose_name="Еженедельных привычек", default=0)
+    monthly = models.IntegerField(verbose_name="Ежемесячных привычек", default=0)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Статистика привычек"
+        verbose_name_plural = "Статистика привычек"
+
+    @property
+    def useful(self) -> int:
+        return self.total - self.pleasant
+
+
+class ScheduleOutbox(models.Model):
+    """Привычки, задачи напоминаний которых нужно привести к текущему состоянию (transactional outbox).
+
+    Запись добавляется в той же транзакции, что и изменение привычки, а задача drain_schedule_outbox
+    пачками применяет изменения к таблицам django_celery_beat вне HTTP-запроса.
+    """
+
+    # Не внешний ключ: запись нужна и после удаления привычки, чтобы удалить ее задачу
+    habit_id = models.BigIntegerField(verbose_name="id привычки")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата изменения")
+
+    def __str__(self):
+        return f"Синхронизация расписания привычки {self.habit_id}"
+
+    class Meta:
+        verbose_name = "Изменение расписания"
+        verbose_name_plural = "Изменения расписаний"
+        ordering = ["pk"]
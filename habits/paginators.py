@@ -1,7 +1,86 @@
-from rest_framework.pagination import PageNumberPagination
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
 
 
 class HabitsPagination(PageNumberPagination):
     page_size = 5
     page_size_query_param = "page_size"
     max_page_size = 10
+
+
+class HabitsCursorPagination(CursorPagination):
+    """Keyset-пагинация по паре (created_at, id).
+
+    Страница выбирается условием по индексу вместо OFFSET и без COUNT(*),
+    поэтому время ответа не зависит от глубины страницы и размера таблицы.
+    """
+
+    page_size = 5
+    page_size_query_param = "page_size"
+    max_page_size = 10
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        position = self.cursor.position if self.cursor else None
+
+        if reverse:
+            queryset = queryset.order_by("created_at", "id")
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if position is not None:
+            created_at, pk = self.decode_position(position)
+            op = "gt" if reverse else "lt"
+            # created_at <= x AND (created_at < x OR id < y): первое условие задает диапазон по индексу
+            queryset = queryset.filter(**{f"created_at__{op}e": created_at}).filter(
+                Q(**{f"created_at__{op}": created_at}) | Q(**{f"id__{op}": pk})
+            )
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.encode_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.encode_position(self.page[0])))
+
+    def encode_position(self, habit) -> str:
+        # Страница может состоять из моделей или из строк .values()
+        if isinstance(habit, dict):
+            return f"{habit['created_at'].isoformat()}|{habit['id']}"
+        return f"{habit.created_at.isoformat()}|{habit.pk}"
+
+    def decode_position(self, position: str):
+        try:
+            created_at, pk = position.split("|")
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
@@ -0,0 +1,47 @@
+from functools import reduce
+from operator import and_
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from rest_framework.filters import BaseFilterBackend
+
+SEARCH_PARAM = "search"
+SEARCH_CONFIG = "russian"
+# GIN-индекс по этому выражению и триграммные индексы создает миграция habits 0009_search_indexes
+SEARCH_VECTOR = SearchVector("action", "place", config=SEARCH_CONFIG)
+
+
+def get_search_text(request) -> str:
+    return request.query_params.get(SEARCH_PARAM, "").strip()
+
+
+def search_habits(queryset, text: str):
+    """Ищет привычки по действию и месту, самые релевантные - первыми.
+
+    На PostgreSQL используется полнотекстовый поиск по GIN-индексу, а опечатки и части слов
+    находятся по триграммам. На остальных СУБД каждое слово ищется подстрокой.
+    """
+    if connections[queryset.db].vendor != "postgresql":
+        words = text.split()
+        return queryset.filter(
+            reduce(and_, (Q(action__icontains=word) | Q(place__icontains=word) for word in words))
+        ).order_by("-created_at", "-id")
+
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+    similarity = Greatest(TrigramSimilarity("action", text), TrigramSimilarity("place", text))
+    return (
+        queryset.alias(search=SEARCH_VECTOR)
+        .filter(Q(search=query) | Q(action__trigram_similar=text) | Q(place__trigram_similar=text))
+        .annotate(rank=SearchRank(SEARCH_VECTOR, query) + similarity)
+        .order_by("-rank", "-created_at", "-id")
+    )
+
+
+class HabitSearchFilter(BaseFilterBackend):
+    """Фильтр списков привычек по параметру search."""
+
+    def filter_queryset(self, request, queryset, view):
+        text = get_search_text(request)
+        return search_habits(queryset, text) if text else queryset
@@ -1,28 +1,221 @@
+from functools import cache
+
+from django.db import transaction
 from rest_framework import serializers
 
-from habits.models import Habits
-from habits.validators import HabitValidator
+from config.metrics import TimedListSerializer, TimedSerializerMixin
+from habits.cache import invalidate_public_feed, refresh_reminder_payloads
+from habits.models import HabitCompletion, Habits, HabitStats, HabitStreak
+from habits.services import bulk_create_habits, bulk_update_habits, get_user_today
+from habits.validators import HabitValidator, to_pk
+
+
+class RelatedHabitField(serializers.PrimaryKeyRelatedField):
+    """Связанная привычка: при пакетной валидации берется из словаря, загруженного одним запросом."""
+
+    def to_internal_value(self, data):
+        related_habits = getattr(self.root, "related_habits", None)
+        if related_habits is None:
+            return super().to_internal_value(data)
+        pk = to_pk(data)
+        if pk is None:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pk not in related_habits:
+            self.fail("does_not_exist", pk_value=data)
+        return related_habits[pk]
+
+
+class HabitsListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """Пакетное создание и обновление привычек.
+
+    Связанные привычки всех элементов загружаются одним запросом, правила HabitValidator
+    проверяются для всего списка сразу, запись идет через bulk_create/bulk_update
+    в одной транзакции вместе с расписаниями напоминаний.
+    Для обновления instance - словарь {pk: привычка}, каждый элемент данных содержит id.
+    """
+
+    validator = HabitValidator()
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.related_habits = self.validator.get_related_habits(data)
+        attrs = super().to_internal_value(data)
+        errors = self.validator.validate_many(attrs, self.related_habits)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+        pk = to_pk(data.get("id")) if isinstance(data, dict) else None
+        self.child.instance = self.instance.get(pk)
+        if self.child.instance is None:
+            raise serializers.ValidationError({"id": ["Привычка не найдена."]})
+        attrs = super().run_child_validation(data)
+        attrs["id"] = pk
+        return attrs
 
+    def create(self, validated_data):
+        habits = bulk_create_habits([Habits(**attrs) for attrs in validated_data])
+        transaction.on_commit(lambda: refresh_reminder_payloads(habits, created=True))
+        if any(PublicHabitsSerializer.is_changed(habit, created=True) for habit in habits):
+            transaction.on_commit(invalidate_public_feed)
+        return habits
 
-class HabitsSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        habits, fields = [], set()
+        for attrs in validated_data:
+            habit = instance[attrs.pop("id")]
+            for attr, value in attrs.items():
+                setattr(habit, attr, value)
+            fields.update(attrs)
+            habits.append(habit)
+
+        feed_changed = any(PublicHabitsSerializer.is_changed(habit) for habit in habits)
+        bulk_update_habits(habits, fields)
+        # bulk_update не вызывает сигналы, поэтому тексты ссылающихся привычек сбрасываются здесь
+        transaction.on_commit(lambda: refresh_reminder_payloads(habits))
+        if feed_changed:
+            transaction.on_commit(invalidate_public_feed)
+        return habits
+
+
+class HabitsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    related_habit = RelatedHabitField(queryset=Habits.objects.all(), required=False, allow_null=True)
 
     class Meta:
         model = Habits
         fields = "__all__"
+        read_only_fields = ("user", "next_fire_at")
         validators = [HabitValidator()]
+        list_serializer_class = HabitsListSerializer
+
+    def get_validators(self):
+        # В составе списка правила проверяет HabitsListSerializer для всех элементов сразу
+        if isinstance(self.parent, HabitsListSerializer):
+            return []
+        return super().get_validators()
 
     def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
         if self.instance:
-            if not data.get("period"):
-                data["period"] = [day.pk for day in self.instance.days_of_week.all()]
-            for field in self.fields.keys():
-                if field not in data.keys():
-                    data[field] = getattr(self.instance, field)
-        return data
+            # Валидатор проверяет привычку целиком, поэтому недостающие поля берутся из объекта
+            for field in self._writable_fields:
+                if field.source not in attrs:
+                    attrs[field.source] = getattr(self.instance, field.source)
+        return attrs
 
 
-class PublicHabitsSerializer(serializers.ModelSerializer):
+class PublicHabitsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Habits
         fields = ("action", "is_pleasant", "max_time_processing")
+
+    # Поиск по ленте идет и по месту, поэтому его изменение тоже меняет закэшированные страницы
+    search_fields = ("place",)
+
+    @classmethod
+    def is_changed(cls, habit: Habits, created: bool = False) -> bool:
+        """Проверяет, видно ли изменение привычки в публичной ленте или в поиске по ней."""
+        if created:
+            return habit.is_public
+        return habit.has_changed("is_public") or (
+            habit.is_public and habit.has_changed(*cls.Meta.fields, *cls.search_fields)
+        )
+
+
+@cache
+def get_readable_fields(serializer_class) -> dict[str, serializers.Field]:
+    """Поля сериализатора для чтения, создаются один раз на класс."""
+    return {name: field for name, field in serializer_class().fields.items() if not field.write_only}
+
+
+class HabitValuesSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    """Быстрое представление привычек только для чтения.
+
+    Принимает строки QuerySet.values() и собирает словари без создания моделей и полей DRF
+    на каждую запись. Преобразуются только значения, которым это нужно (например, даты),
+    тем же полем исходного сериализатора, поэтому ответ совпадает с его ответом.
+    """
+
+    # Значения этих полей из .values() уже имеют нужный вид, связи приходят как первичные ключи
+    passthrough_fields = (
+        serializers.BooleanField,
+        serializers.CharField,
+        serializers.ChoiceField,
+        serializers.IntegerField,
+        serializers.RelatedField,
+    )
+
+    class Meta:
+        list_serializer_class = TimedListSerializer
+
+    def __init__(self, *args, source_serializer=HabitsSerializer, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        readable_fields = get_readable_fields(source_serializer)
+        self.field_names = tuple(fields or readable_fields)
+        self.converters = {
+            name: readable_fields[name].to_representation
+            for name in self.field_names
+            if not isinstance(readable_fields[name], self.passthrough_fields)
+        }
+
+    def to_representation(self, row):
+        converters = self.converters
+        return {
+            name: converters[name](row[name]) if name in converters and row[name] is not None else row[name]
+            for name in self.field_names
+        }
+
+
+class HabitCompletionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Отметка о выполнении, по умолчанию - сегодняшним днем пользователя."""
+
+    completed_on = serializers.DateField(required=False)
+
+    class Meta:
+        model = HabitCompletion
+        fields = ("completed_on",)
+
+    def validate(self, attrs):
+        today = get_user_today(self.context["request"].user)
+        attrs.setdefault("completed_on", today)
+        if attrs["completed_on"] > today:
+            raise serializers.ValidationError({"completed_on": "Нельзя отметить выполнение в будущем."})
+        return attrs
+
+
+class HabitStreakSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Статистика выполнения привычки, считается по агрегату без чтения журнала."""
+
+    current_streak = serializers.SerializerMethodField()
+    completion_rate = serializers.SerializerMethodField()
+
+    class Meta:
+        model = HabitStreak
+        fields = (
+            "habit",
+            "current_streak",
+            "longest_streak",
+            "completed_periods",
+            "completion_rate",
+            "last_completed_on",
+        )
+
+    def get_current_streak(self, streak: HabitStreak) -> int:
+        return streak.get_current_streak(get_user_today(streak.habit.user), streak.habit.period)
+
+    def get_completion_rate(self, streak: HabitStreak) -> float:
+        return streak.get_completion_rate(get_user_today(streak.habit.user), streak.habit.period)
+
+
+class HabitStatsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Счетчики привычек пользователя по видам и периодичности."""
+
+    useful = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = HabitStats
+        fields = ("total", "useful", "pleasant", "public", "daily", "weekly", "monthly")
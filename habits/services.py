@@ -1,8 +1,44 @@
 import json
+import logging
+import random
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+from zoneinfo import ZoneInfo
 
-from django_celery_beat.models import CrontabSchedule, PeriodicTask
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import CharField, Exists, OuterRef, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+from django_celery_beat.models import CrontabSchedule, PeriodicTask, PeriodicTasks
+from kombu.exceptions import OperationalError
+from rest_framework.exceptions import ValidationError
 
-from habits.models import Habits
+from habits.models import HabitCompletion, Habits, HabitStreak, ScheduleOutbox
+from habits.stats import batch_user_stats, track_created, track_updated
+
+logger = logging.getLogger(__name__)
+
+REMINDER_MODE_DISPATCHER = "dispatcher"
+REMINDER_TASK_NAME = "Sending reminder {pk}"
+REMINDER_TASK = "habits.tasks.send_message"
+# Задачи старого формата ("Напоминание о привычке ...") ссылаются на несуществующую задачу Celery
+REMINDER_TASKS = (REMINDER_TASK, "habits.tasks.send_habit_reminder")
+REMINDER_HOUR = 9
+REMINDER_MINUTE = 0
+HABIT_CRONTABS = {
+    1: "0 9 * * *",  # Ежедневно в 9:00
+    7: "0 9 * * 1",  # Еженедельно в понедельник в 9:00
+    30: "0 9 1 * *",  # Ежемесячно 1 числа в 9:00
+}
+SCHEDULE_ID_KEY = "habits:crontab:{crontab}:{tz}"
+SCHEDULE_LOCK_KEY = "habits:crontab-lock:{crontab}:{tz}"
+SCHEDULE_LOCK_TIMEOUT = 10
+
+# Идентификаторы расписаний по cron-строке и часовому поясу, общие для всех запросов процесса
+_schedule_ids: dict[tuple[str, str], int] = {}
 
 
 def create_replacements() -> dict[str, str]:
@@ -24,72 +60,405 @@ def make_replacements(text: str, replacements: dict) -> str:
     return text
 
 
+def get_schedule_cache_key(crontab: str, tz: str) -> str:
+    return SCHEDULE_ID_KEY.format(crontab=crontab.replace(" ", "_"), tz=tz)
+
+
+def get_schedule_id(crontab: str, tz: str | None = None) -> int:
+    """Возвращает id расписания по cron-строке и часовому поясу, обращаясь к базе только при промахе обоих кэшей.
+
+    Сначала проверяется кэш процесса, затем общий кэш (Redis), и только потом база.
+    """
+    tz = tz or settings.CELERY_TIMEZONE
+    schedule_id = _schedule_ids.get((crontab, tz))
+    if schedule_id is None:
+        schedule_id = cache.get(get_schedule_cache_key(crontab, tz))
+        if schedule_id is None:
+            schedule_id = find_or_create_schedule(crontab, tz)
+            cache.set(get_schedule_cache_key(crontab, tz), schedule_id, timeout=None)
+        _schedule_ids[(crontab, tz)] = schedule_id
+    return schedule_id
+
+
+def find_or_create_schedule(crontab: str, tz: str) -> int:
+    """Находит или создает расписание в базе под блокировкой в общем кэше.
+
+    У CrontabSchedule нет уникального ограничения, поэтому параллельный get_or_create
+    может создать дубли. Блокировка через cache.add не дает создавать их одновременно,
+    а если дубли уже есть, всегда выбирается расписание с наименьшим id.
+    """
+    minute, hour, day_of_month, month_of_year, day_of_week = crontab.split()
+    fields = {
+        "minute": minute,
+        "hour": hour,
+        "day_of_week": day_of_week,
+        "day_of_month": day_of_month,
+        "month_of_year": month_of_year,
+        "timezone": tz,
+    }
+    lock_key = SCHEDULE_LOCK_KEY.format(crontab=crontab.replace(" ", "_"), tz=tz)
+    deadline = time.monotonic() + SCHEDULE_LOCK_TIMEOUT
+    locked = cache.add(lock_key, 1, timeout=SCHEDULE_LOCK_TIMEOUT)
+    while not locked and time.monotonic() < deadline:
+        time.sleep(0.05)
+        locked = cache.add(lock_key, 1, timeout=SCHEDULE_LOCK_TIMEOUT)
+    try:
+        schedule_id = CrontabSchedule.objects.filter(**fields).order_by("pk").values_list("pk", flat=True).first()
+        if schedule_id is None:
+            schedule_id = CrontabSchedule.objects.create(**fields).pk
+    finally:
+        # Не дождавшись блокировки, нельзя снимать чужую: ее владелец еще создает расписание
+        if locked:
+            cache.delete(lock_key)
+    return schedule_id
+
+
+def clear_schedule_cache(crontab: str | None = None, tz: str | None = None) -> None:
+    """Сбрасывает закэшированные id расписаний: одно по cron-строке или все известные процессу."""
+    if crontab:
+        keys = [(crontab, tz or settings.CELERY_TIMEZONE)]
+    else:
+        keys = [*_schedule_ids, *((crontab, settings.CELERY_TIMEZONE) for crontab in HABIT_CRONTABS.values())]
+    cache.delete_many([get_schedule_cache_key(*key) for key in keys])
+    for key in keys:
+        _schedule_ids.pop(key, None)
+
+
+def warm_schedule_cache() -> None:
+    """Заранее загружает id расписаний всех периодичностей привычек."""
+    for crontab in set(HABIT_CRONTABS.values()):
+        get_schedule_id(crontab)
+
+
 def create_schedule(crontab: str) -> CrontabSchedule:
     """Создает расписание для отправки напоминаний."""
     minute, hour, day_of_month, month_of_year, day_of_week = crontab.split()
-    schedule, created = CrontabSchedule.objects.get_or_create(
+    # Для привязки задачи к расписанию достаточно id, поэтому объект не загружается из базы
+    return CrontabSchedule(
+        pk=get_schedule_id(crontab),
         minute=minute,
         hour=hour,
         day_of_week=day_of_week,
         day_of_month=day_of_month,
         month_of_year=month_of_year,
     )
-    return schedule
 
 
 def create_periodic_task_for_habit(habit: Habits) -> None:
     """Создает периодическую задачу для отправки напоминаний о привычке."""
-    # Определяем cron-расписание на основе периодичности привычки
-    if habit.period == 1:  # Ежедневно
-        crontab = "0 9 * * *"  # Каждый день в 9:00
-    elif habit.period == 7:  # Еженедельно
-        crontab = "0 9 * * 1"  # Каждый понедельник в 9:00
-    elif habit.period == 30:  # Ежемесячно
-        crontab = "0 9 1 * *"  # Первое число каждого месяца в 9:00
-    else:
-        crontab = "0 9 * * *"  # По умолчанию ежедневно
-
-    schedule = create_schedule(crontab)
-
-    # Создаем периодическую задачу
-    PeriodicTask.objects.create(
-        crontab=schedule,
-        name=f"Напоминание о привычке {habit.pk} - {habit.action}",
-        task="habits.tasks.send_habit_reminder",
-        args=json.dumps([habit.pk]),
-        description=f"Напоминание для привычки: {habit.action} в {habit.place}",
-    )
+    create_tasks([habit])
 
 
 def update_habit_schedule(habit: Habits) -> None:
     """Обновляет расписание для существующей привычки."""
-    # Удаляем старые задачи для этой привычки
-    PeriodicTask.objects.filter(name__startswith=f"Напоминание о привычке {habit.pk}").delete()
-
-    # Создаем новую задачу
-    create_periodic_task_for_habit(habit)
+    sync_tasks([habit.pk])
 
 
 def delete_habit_schedule(habit_id: int) -> None:
     """Удаляет расписание для привычки."""
-    PeriodicTask.objects.filter(name__startswith=f"Напоминание о привычке {habit_id}").delete()
+    delete_tasks([habit_id])
 
 
-def get_habit_crontab(period: int) -> str:
-    """Возвращает cron-строку на основе периодичности привычки."""
-    crontab_map = {
-        1: "0 9 * * *",  # Ежедневно в 9:00
-        7: "0 9 * * 1",  # Еженедельно в понедельник в 9:00
-        30: "0 9 1 * *",  # Ежемесячно 1 числа в 9:00
-    }
-    return crontab_map.get(period, "0 9 * * *")
+def get_habit_crontab(period: int, reminder_time=None) -> str:
+    """Возвращает cron-строку на основе периодичности привычки и времени напоминаний пользователя."""
+    crontab = HABIT_CRONTABS.get(period, HABIT_CRONTABS[1])
+    if reminder_time is None:
+        return crontab
+    day_of_month, month_of_year, day_of_week = crontab.split()[2:]
+    return f"{reminder_time.minute} {reminder_time.hour} {day_of_month} {month_of_year} {day_of_week}"
 
 
 def create_task(schedule: CrontabSchedule, habit: Habits) -> None:
     """Creates period task to send reminders."""
     PeriodicTask.objects.create(
         crontab=schedule,
-        name=f"Sending reminder {habit.pk}",
-        task="habits.tasks.send_message",
+        name=REMINDER_TASK_NAME.format(pk=habit.pk),
+        task=REMINDER_TASK,
         args=json.dumps([habit.pk]),
     )
+
+
+def get_next_fire_at(
+    period: int, after: datetime | None = None, tz: str | None = None, reminder_time=None
+) -> datetime:
+    """Возвращает ближайшее после after время напоминания по расписанию get_habit_crontab.
+
+    По умолчанию напоминание приходит в 9:00 по CELERY_TIMEZONE, tz и reminder_time задают
+    часовой пояс и время пользователя.
+    """
+    local_now = (after or timezone.now()).astimezone(ZoneInfo(tz or settings.CELERY_TIMEZONE))
+    hour, minute = (reminder_time.hour, reminder_time.minute) if reminder_time else (REMINDER_HOUR, REMINDER_MINUTE)
+    fire_at = local_now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+    if period == Habits.WEEKLY:
+        fire_at += timedelta(days=-fire_at.weekday())
+        if fire_at <= local_now:
+            fire_at += timedelta(days=7)
+    elif period == Habits.MONTHLY:
+        fire_at = fire_at.replace(day=1)
+        if fire_at <= local_now:
+            fire_at = (fire_at + timedelta(days=32)).replace(day=1)
+    elif fire_at <= local_now:
+        fire_at += timedelta(days=1)
+
+    return fire_at
+
+
+def get_habit_next_fire_at(
+    is_pleasant: bool, period: int, after: datetime | None = None, user=None
+) -> datetime | None:
+    """Возвращает время ближайшего напоминания о привычке, для приятных привычек напоминаний нет.
+
+    Время считается в часовом поясе пользователя и сдвигается на случайную величину в пределах
+    HABITS_REMINDER_JITTER секунд, чтобы напоминания, назначенные на одно время, не уходили одной минутой.
+    """
+    if is_pleasant:
+        return None
+    fire_at = get_next_fire_at(period, after, getattr(user, "timezone", None), getattr(user, "reminder_time", None))
+    return fire_at + timedelta(seconds=random.uniform(0, settings.HABITS_REMINDER_JITTER))
+
+
+def schedule_reminders(batch_size: int = 1000, remove_tasks: bool = True) -> int:
+    """Назначает next_fire_at полезным привычкам, у которых его нет, и удаляет их периодические задачи.
+
+    Нужна при переходе в режим диспетчера: привычки, созданные в режиме periodic_task, иначе
+    не попадут в выборку диспетчера, а их задачи продолжат отправлять напоминания параллельно с ним.
+    Время и удаление задач пачки записываются в одной транзакции, с remove_tasks=False задачи
+    удаляет вызывающий код. Возвращает число привычек.
+    """
+    habits = (
+        Habits.objects.filter(is_pleasant=False, next_fire_at__isnull=True)
+        .select_related("user")
+        .only("pk", "period", "is_pleasant", "user__timezone", "user__reminder_time")
+        .order_by("pk")
+    )
+    now = timezone.now()
+    scheduled = 0
+    iterator = habits.iterator(chunk_size=batch_size)
+    while batch := list(islice(iterator, batch_size)):
+        for habit in batch:
+            habit.next_fire_at = get_habit_next_fire_at(False, habit.period, now, habit.user)
+        with transaction.atomic():
+            Habits.objects.bulk_update(batch, ["next_fire_at"])
+            if remove_tasks:
+                delete_tasks([habit.pk for habit in batch])
+        scheduled += len(batch)
+    return scheduled
+
+
+def create_tasks(habits: list[Habits], ignore_conflicts: bool = False) -> None:
+    """Создает периодические задачи напоминаний для пачки привычек одним запросом.
+
+    С ignore_conflicts уже существующие задачи пропускаются, а не вызывают ошибку.
+    """
+    tasks = []
+    for habit in habits:
+        if habit.is_pleasant or not habit.user.chat_id:
+            continue
+        tasks.append(
+            PeriodicTask(
+                crontab_id=get_schedule_id(
+                    get_habit_crontab(habit.period, habit.user.reminder_time), habit.user.timezone
+                ),
+                name=REMINDER_TASK_NAME.format(pk=habit.pk),
+                task=REMINDER_TASK,
+                args=json.dumps([habit.pk]),
+            )
+        )
+    if tasks:
+        PeriodicTask.objects.bulk_create(tasks, ignore_conflicts=ignore_conflicts)
+        # bulk_create не вызывает сигналы, поэтому beat нужно явно сообщить об изменениях
+        PeriodicTasks.update_changed()
+
+
+def delete_tasks(pks) -> None:
+    """Удаляет периодические задачи напоминаний для пачки привычек одним запросом."""
+    deleted, _ = PeriodicTask.objects.filter(name__in=[REMINDER_TASK_NAME.format(pk=pk) for pk in pks]).delete()
+    if deleted:
+        PeriodicTasks.update_changed()
+
+
+def sync_tasks(pks) -> None:
+    """Приводит задачи напоминаний привычек к их текущему состоянию: удаляет старые и создает нужные."""
+    delete_tasks(pks)
+    create_tasks(list(Habits.objects.filter(pk__in=pks, is_pleasant=False).select_related("user")))
+
+
+def get_task_name_expression(pk):
+    """SQL-выражение имени задачи напоминания по id привычки, как в REMINDER_TASK_NAME."""
+    return Concat(Value(REMINDER_TASK_NAME.format(pk="")), Cast(pk, CharField()))
+
+
+def reconcile_tasks(batch_size: int = 1000) -> dict[str, int]:
+    """Сверяет задачи напоминаний в django_celery_beat с привычками.
+
+    Задачи без привычки, которой нужно напоминание (удаленной, ставшей приятной, у пользователя
+    без Telegram или в режиме диспетчера, где задачи не нужны вовсе), удаляются одним DELETE
+    с антиобъединением по имени задачи. В режиме диспетчера в той же транзакции привычкам без
+    next_fire_at сначала назначается время напоминания, чтобы после удаления задач их подхватил
+    диспетчер. Недостающие задачи находятся таким же антиобъединением со стороны привычек
+    и создаются пачками. Возвращает число удаленных и созданных задач, число привычек,
+    переданных диспетчеру, и число включенных задач beat до и после сверки.
+    """
+    enabled = PeriodicTask.objects.filter(enabled=True)
+    result = {"tasks_before": enabled.count(), "scheduled": 0}
+
+    dispatcher = settings.HABITS_REMINDER_MODE == REMINDER_MODE_DISPATCHER
+    expected = Habits.objects.none()
+    if not dispatcher:
+        expected = Habits.objects.filter(is_pleasant=False).exclude(user__chat_id="")
+    orphans = PeriodicTask.objects.filter(task__in=REMINDER_TASKS).filter(
+        ~Exists(expected.alias(task_name=get_task_name_expression("pk")).filter(task_name=OuterRef("name")))
+    )
+    with transaction.atomic():
+        if dispatcher:
+            result["scheduled"] = schedule_reminders(batch_size, remove_tasks=False)
+        # Через QuerySet.delete() сигналы django_celery_beat загрузили бы задачи в память и обновили бы
+        # PeriodicTasks на каждую строку, поэтому удаление идет одним DELETE, а beat оповещается один раз
+        orphans_sql, params = orphans.values("pk").query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(PeriodicTask._meta.db_table)} "
+                f"WHERE {connection.ops.quote_name(PeriodicTask._meta.pk.column)} IN ({orphans_sql})",
+                params,
+            )
+            result["deleted"] = cursor.rowcount
+        if result["deleted"]:
+            PeriodicTasks.update_changed()
+
+    missing = (
+        expected.filter(~Exists(PeriodicTask.objects.filter(name=get_task_name_expression(OuterRef("pk")))))
+        .select_related("user")
+        .only("pk", "period", "is_pleasant", "user__chat_id", "user__timezone", "user__reminder_time")
+        .order_by("pk")
+    )
+    result["created"] = 0
+    habits = missing.iterator(chunk_size=batch_size)
+    while batch := list(islice(habits, batch_size)):
+        # Задачу могла успеть создать синхронизация из outbox
+        create_tasks(batch, ignore_conflicts=True)
+        result["created"] += len(batch)
+
+    result["tasks_after"] = enabled.count()
+    return result
+
+
+def enqueue_tasks_sync(pks) -> None:
+    """Записывает привычки в outbox расписаний в текущей транзакции.
+
+    Задачи напоминаний пересоздаются воркером после фиксации транзакции, поэтому запросы к API
+    не ждут таблиц django_celery_beat и не конкурируют за их блокировки с beat.
+    """
+    if not pks:
+        return
+    ScheduleOutbox.objects.bulk_create([ScheduleOutbox(habit_id=pk) for pk in pks])
+
+    def drain():
+        from habits.tasks import drain_schedule_outbox
+
+        try:
+            drain_schedule_outbox.delay()
+        except OperationalError:
+            # Изменение уже зафиксировано, и ответ 500 привел бы к повтору запроса и дублю привычки;
+            # outbox разберет ежеминутный запуск drain_schedule_outbox из beat
+            logger.exception("Не удалось поставить drain_schedule_outbox в очередь")
+
+    transaction.on_commit(drain)
+
+
+def bulk_create_habits(habits: list[Habits]) -> list[Habits]:
+    """Создает привычки и расписания их напоминаний пачкой в одной транзакции."""
+    dispatcher = settings.HABITS_REMINDER_MODE == REMINDER_MODE_DISPATCHER
+    with transaction.atomic():
+        if dispatcher:
+            for habit in habits:
+                habit.next_fire_at = get_habit_next_fire_at(habit.is_pleasant, habit.period, user=habit.user)
+        Habits.objects.bulk_create(habits)
+        track_created(habits)
+        if not dispatcher:
+            enqueue_tasks_sync([habit.pk for habit in habits])
+    return habits
+
+
+def bulk_update_habits(habits: list[Habits], fields) -> list[Habits]:
+    """Обновляет привычки пачкой, перестраивая расписание только тех, у которых оно изменилось."""
+    dispatcher = settings.HABITS_REMINDER_MODE == REMINDER_MODE_DISPATCHER
+    rescheduled = [habit for habit in habits if habit.has_changed("period", "is_pleasant")]
+    now = timezone.now()
+    with transaction.atomic():
+        for habit in habits:
+            habit.updated_at = now
+        if dispatcher:
+            for habit in rescheduled:
+                habit.next_fire_at = get_habit_next_fire_at(habit.is_pleasant, habit.period, now, habit.user)
+        Habits.objects.bulk_update(habits, [*fields, "updated_at", "next_fire_at"])
+        with batch_user_stats():
+            for habit in habits:
+                track_updated(habit)
+        if not dispatcher:
+            enqueue_tasks_sync([habit.pk for habit in rescheduled])
+    return habits
+
+
+def reschedule_user_habits(user) -> None:
+    """Пересчитывает напоминания привычек пользователя после смены часового пояса или времени напоминаний."""
+    habits = list(user.habits.filter(is_pleasant=False).only("pk", "period", "is_pleasant"))
+    if settings.HABITS_REMINDER_MODE == REMINDER_MODE_DISPATCHER:
+        now = timezone.now()
+        for habit in habits:
+            habit.next_fire_at = get_habit_next_fire_at(False, habit.period, now, user)
+        Habits.objects.bulk_update(habits, ["next_fire_at"], batch_size=1000)
+    else:
+        enqueue_tasks_sync([habit.pk for habit in habits])
+
+
+def get_user_today(user) -> date:
+    """Возвращает текущую дату в часовом поясе пользователя."""
+    return timezone.now().astimezone(ZoneInfo(user.timezone)).date()
+
+
+def complete_habit(habit: Habits, completed_on: date) -> tuple[HabitStreak, bool]:
+    """Добавляет отметку о выполнении в журнал и пересчитывает серию по последней отметке.
+
+    Возвращает агрегат и признак того, что отметка новая: повторная отметка за тот же день ничего не меняет.
+    Отметки принимаются только в хронологическом порядке, поэтому пересчет не требует чтения журнала.
+    """
+    with transaction.atomic():
+        # Блокировка привычки упорядочивает параллельные отметки, в том числе самую первую
+        Habits.objects.select_for_update().filter(pk=habit.pk).values_list("pk").first()
+        streak = HabitStreak.objects.filter(habit=habit).first()
+
+        if streak is None:
+            streak = HabitStreak(habit=habit, started_on=completed_on)
+        elif completed_on == streak.last_completed_on:
+            return streak, False
+        elif streak.last_completed_on and completed_on < streak.last_completed_on:
+            raise ValidationError({"completed_on": "Нельзя отметить выполнение раньше последней отметки."})
+
+        HabitCompletion.objects.create(habit=habit, completed_on=completed_on)
+
+        if streak.last_completed_on is None:
+            streak.current_streak = streak.completed_periods = 1
+        else:
+            gap = streak.get_period_index(completed_on, habit.period) - streak.get_period_index(
+                streak.last_completed_on, habit.period
+            )
+            if gap:
+                streak.current_streak = streak.current_streak + 1 if gap == 1 else 1
+                streak.completed_periods += 1
+        streak.last_completed_on = completed_on
+        streak.longest_streak = max(streak.longest_streak, streak.current_streak)
+        streak.save()
+    return streak, True
+
+
+def bulk_delete_habits(queryset) -> int:
+    """Удаляет привычки вместе с задачами их напоминаний и возвращает число удаленных привычек."""
+    with transaction.atomic(), batch_user_stats():
+        if settings.HABITS_REMINDER_MODE == REMINDER_MODE_DISPATCHER:
+            # Периодических задач в этом режиме нет, поэтому id заранее не выбираются
+            return queryset.delete()[1].get(Habits._meta.label, 0)
+        pks = list(queryset.values_list("pk", flat=True))
+        Habits.objects.filter(pk__in=pks).delete()
+        enqueue_tasks_sync(pks)
+    return len(pks)
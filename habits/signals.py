@@ -0,0 +1,101 @@
+from celery.signals import worker_ready
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django_celery_beat.models import CrontabSchedule
+
+from habits.cache import delete_reminder_payloads, invalidate_public_feed, refresh_reminder_payloads
+from habits.models import Habits
+from habits.serializers import PublicHabitsSerializer
+from habits.services import clear_schedule_cache, reschedule_user_habits, warm_schedule_cache
+from habits.stats import track_created, track_deleted, track_updated
+from users.models import User
+
+
+@receiver(post_save, sender=Habits)
+def refresh_reminder_payload(sender, instance, created, **kwargs):
+    """Обновляет данные напоминания привычки и сбрасывает их у привычек, которые на нее ссылаются.
+
+    Кэш меняется после фиксации транзакции, чтобы при откате в нем не остались данные, которых нет в базе.
+    """
+    transaction.on_commit(lambda: refresh_reminder_payloads([instance], created))
+
+
+@receiver(pre_delete, sender=Habits)
+def delete_reminder_payload(sender, instance, **kwargs):
+    """Удаляет данные напоминания удаленной привычки и привычек, которые на нее ссылаются.
+
+    Ссылки на удаленную привычку обнуляются (SET_NULL) без сигналов сохранения, поэтому
+    ссылающиеся привычки выбираются до удаления.
+    """
+    pks = [instance.pk, *instance.linked_habits.values_list("pk", flat=True)]
+    transaction.on_commit(lambda: delete_reminder_payloads(pks))
+
+
+@receiver(post_save, sender=Habits)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    """Обновляет счетчики привычек пользователя."""
+    if created:
+        track_created([instance])
+    else:
+        track_updated(instance)
+
+
+@receiver(post_delete, sender=Habits)
+def update_stats_on_delete(sender, instance, origin=None, **kwargs):
+    """Вычитает удаленную привычку из счетчиков пользователя.
+
+    При удалении самого пользователя его статистика удаляется вместе с ним и не пересобирается.
+    """
+    if isinstance(origin, User) or getattr(origin, "model", None) is User:
+        return
+    track_deleted(instance)
+
+
+@receiver(post_save, sender=User)
+def reset_user_reminder_payloads(sender, instance, created, update_fields, **kwargs):
+    """Сбрасывает данные напоминаний пользователя при возможной смене чата в Telegram."""
+    if created or (update_fields and "chat_id" not in update_fields):
+        return
+    delete_reminder_payloads(instance.habits.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=User)
+def reschedule_user_reminders(sender, instance, created, update_fields, **kwargs):
+    """Переносит напоминания пользователя при возможной смене часового пояса или времени напоминаний."""
+    if created or (update_fields and not {"timezone", "reminder_time"} & set(update_fields)):
+        return
+    reschedule_user_habits(instance)
+
+
+@receiver(post_save, sender=Habits)
+def reset_public_feed_on_save(sender, instance, created, **kwargs):
+    """Сбрасывает кэш публичной ленты, только если изменение видно в ней.
+
+    Кэш сбрасывается после фиксации транзакции: иначе параллельный запрос успел бы снова
+    закэшировать страницу со старыми данными.
+    """
+    if PublicHabitsSerializer.is_changed(instance, created):
+        transaction.on_commit(invalidate_public_feed)
+
+
+@receiver(post_delete, sender=Habits)
+def reset_public_feed_on_delete(sender, instance, **kwargs):
+    """Сбрасывает кэш публичной ленты при удалении публичной привычки."""
+    if instance.is_public:
+        transaction.on_commit(invalidate_public_feed)
+
+
+@receiver(post_delete, sender=CrontabSchedule)
+def reset_schedule_cache(sender, instance, **kwargs):
+    """Сбрасывает закэшированный id удаленного расписания."""
+    clear_schedule_cache(
+        f"{instance.minute} {instance.hour} {instance.day_of_month} {instance.month_of_year} {instance.day_of_week}",
+        str(instance.timezone),
+    )
+
+
+@worker_ready.connect
+def warm_up_schedule_cache(**kwargs):
+    """Загружает id расписаний при старте воркера, чтобы первые задачи не ходили за ними в базу."""
+    warm_schedule_cache()
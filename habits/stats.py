@@ -0,0 +1,116 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from habits.models import Habits, HabitStats
+
+PERIOD_COUNTERS = {Habits.DAILY: "daily", Habits.WEEKLY: "weekly", Habits.MONTHLY: "monthly"}
+TRACKED_FIELDS = ("user", "is_pleasant", "is_public", "period")
+
+_pending = ContextVar("habit_stats_pending", default=None)
+
+
+def get_counters(is_pleasant: bool, is_public: bool, period: int, sign: int = 1) -> Counter:
+    """Вклад одной привычки в счетчики пользователя, sign=-1 - чтобы его вычесть."""
+    counters = Counter(total=sign, pleasant=sign * is_pleasant, public=sign * is_public)
+    counters[PERIOD_COUNTERS[period]] += sign
+    return counters
+
+
+def count_user_habits(user) -> dict:
+    """Считает счетчики пользователя по таблице привычек одним агрегирующим запросом."""
+    return Habits.objects.filter(user=user).aggregate(
+        total=Count("pk"),
+        pleasant=Count("pk", filter=Q(is_pleasant=True)),
+        public=Count("pk", filter=Q(is_public=True)),
+        **{name: Count("pk", filter=Q(period=period)) for period, name in PERIOD_COUNTERS.items()},
+    )
+
+
+def create_user_stats(user_id: int) -> HabitStats | None:
+    """Собирает строку статистики по таблице привычек.
+
+    Возвращает None, если строку уже создал параллельный запрос: вставка ждет его фиксации
+    по первичному ключу, а затем падает с IntegrityError.
+    """
+    try:
+        with transaction.atomic():
+            return HabitStats.objects.create(user_id=user_id, **count_user_habits(user_id))
+    except IntegrityError:
+        return None
+
+
+def get_user_stats(user) -> HabitStats:
+    """Возвращает статистику пользователя, при первом обращении собирая ее по таблице привычек."""
+    stats = HabitStats.objects.filter(user=user).first()
+    if stats is None:
+        stats = create_user_stats(user.pk) or HabitStats.objects.get(user=user)
+    return stats
+
+
+def update_user_stats(deltas: dict[int, Counter]) -> None:
+    """Применяет приращения счетчиков одним UPDATE на пользователя.
+
+    Если строки еще нет, она собирается целиком по таблице привычек, где это изменение уже видно.
+    Когда ее одновременно создал другой запрос, его подсчет изменения не видел, и приращение
+    применяется к созданной им строке, поэтому изменение не теряется.
+    """
+    pending = _pending.get()
+    if pending is not None:
+        for user_id, counters in deltas.items():
+            pending[user_id].update(counters)
+        return
+    now = timezone.now()
+    for user_id, counters in deltas.items():
+        changes = {name: F(name) + value for name, value in counters.items() if value}
+        if not changes:
+            continue
+        stats = HabitStats.objects.filter(user_id=user_id)
+        if not stats.update(**changes, updated_at=now) and create_user_stats(user_id) is None:
+            stats.update(**changes, updated_at=now)
+
+
+@contextmanager
+def batch_user_stats():
+    """Копит приращения внутри блока и применяет их при выходе, а не на каждую привычку."""
+    if _pending.get() is not None:
+        yield
+        return
+    pending = defaultdict(Counter)
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    update_user_stats(pending)
+
+
+def track_created(habits) -> None:
+    deltas = defaultdict(Counter)
+    for habit in habits:
+        deltas[habit.user_id].update(get_counters(habit.is_pleasant, habit.is_public, habit.period))
+    update_user_stats(deltas)
+
+
+def track_updated(habit: Habits) -> None:
+    """Переносит вклад привычки с загруженных из базы значений на текущие."""
+    if not habit.has_changed(*TRACKED_FIELDS):
+        return
+    loaded = getattr(habit, "_loaded_values", None) or {}
+    fields = [Habits._meta.get_field(name).attname for name in TRACKED_FIELDS]
+    if any(field not in loaded for field in fields):
+        # Прежние значения неизвестны, строка будет собрана заново при следующем чтении
+        HabitStats.objects.filter(user_id=habit.user_id).delete()
+        return
+    deltas = defaultdict(Counter)
+    deltas[loaded["user_id"]].update(get_counters(loaded["is_pleasant"], loaded["is_public"], loaded["period"], -1))
+    deltas[habit.user_id].update(get_counters(habit.is_pleasant, habit.is_public, habit.period))
+    update_user_stats(deltas)
+
+
+def track_deleted(habit: Habits) -> None:
+    update_user_stats({habit.user_id: get_counters(habit.is_pleasant, habit.is_public, habit.period, -1)})
@@ -1,20 +1,130 @@
+from itertools import islice
+
 import requests
-from celery import shared_task
+from celery import group, shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from habits.cache import get_reminder_payloads
+from habits.models import FailedReminder, Habits, ScheduleOutbox
+from habits.services import REMINDER_MODE_DISPATCHER, get_habit_next_fire_at, reconcile_tasks, sync_tasks
+from habits.telegram import get_client, get_retry_delay
+
+
+def deliver(task, pks) -> tuple[int, list[int], float]:
+    """Отправляет напоминания и разбирает ответы Telegram.
+
+    Возвращает число отправленных, id привычек для повтора и задержку повтора. Напоминания,
+    которые повтор не исправит или у которых закончились попытки, сохраняются в FailedReminder.
+    """
+    payloads = {pk: payload for pk, payload in get_reminder_payloads(pks).items() if payload["chat_id"]}
+    results = get_client().send_messages([(payload["chat_id"], payload["text"]) for payload in payloads.values()])
+
+    sent, retry_pks, delays, failed = 0, [], [], []
+    attempt = task.request.retries
+    for pk, result in zip(payloads, results):
+        if getattr(result, "ok", False):
+            sent += 1
+            continue
+        delay = get_retry_delay(result, attempt)
+        if delay is None or attempt >= settings.HABITS_REMINDER_MAX_RETRIES:
+            failed.append(
+                FailedReminder(
+                    habit_id=pk,
+                    status_code=getattr(result, "status_code", None),
+                    error=result.text[:1000] if isinstance(result, requests.Response) else repr(result),
+                    attempts=attempt + 1,
+                )
+            )
+        else:
+            retry_pks.append(pk)
+            delays.append(delay)
+
+    if failed:
+        FailedReminder.objects.bulk_create(failed)
+    return sent, retry_pks, max(delays, default=0)
+
+
+@shared_task(bind=True, max_retries=None)
+def send_message(self, pk) -> int:
+    """Отправка напоминания пользователю с повтором при 429 и временных ошибках."""
+    sent, retry_pks, countdown = deliver(self, [pk])
+    if retry_pks:
+        raise self.retry(countdown=countdown)
+    return sent
+
+
+@shared_task(bind=True, max_retries=None)
+def send_messages_bulk(self, pks) -> int:
+    """Параллельная отправка пачки напоминаний в пределах лимита Telegram.
+
+    Повторно отправляются только неудачные напоминания пачки.
+    """
+    sent, retry_pks, countdown = deliver(self, pks)
+    if retry_pks:
+        raise self.retry(args=(retry_pks,), countdown=countdown)
+    return sent
+
+
+@shared_task
+def dispatch_due_reminders() -> int:
+    """Выбирает привычки, время напоминания которых наступило, и рассылает их пачками.
+
+    Запускается beat раз в минуту вместо отдельной PeriodicTask на каждую привычку. В режиме
+    periodic_task ничего не делает: напоминания отправляют задачи привычек, а устаревший
+    next_fire_at отправил бы напоминание второй раз.
+    """
+    if settings.HABITS_REMINDER_MODE != REMINDER_MODE_DISPATCHER:
+        return 0
+    now = timezone.now()
+    due = Habits.objects.filter(next_fire_at__lte=now, is_pleasant=False)
+
+    with transaction.atomic():
+        # Не больше HABITS_REMINDER_MAX_PER_MINUTE за запуск: остальные останутся просроченными
+        # и уйдут в следующие минуты в порядке очереди, так пик нагрузки ограничен
+        habits = list(
+            due.select_related("user")
+            .select_for_update(skip_locked=True, of=("self",))
+            .only("pk", "period", "is_pleasant", "user__chat_id", "user__timezone", "user__reminder_time")
+            .order_by("next_fire_at")[: settings.HABITS_REMINDER_MAX_PER_MINUTE]
+        )
+        for habit in habits:
+            habit.next_fire_at = get_habit_next_fire_at(False, habit.period, now, habit.user)
+        Habits.objects.bulk_update(habits, ["next_fire_at"], batch_size=1000)
+
+    pks = [habit.pk for habit in habits if habit.user.chat_id]
+    if pks:
+        iterator = iter(pks)
+        chunks = iter(lambda: list(islice(iterator, settings.HABITS_REMINDER_CHUNK_SIZE)), [])
+        group(send_messages_bulk.s(chunk) for chunk in chunks).apply_async()
+    return len(pks)
+
+
+@shared_task
+def drain_schedule_outbox() -> int:
+    """Применяет накопленные в outbox изменения расписаний пачками по HABITS_SCHEDULE_OUTBOX_BATCH.
 
-from config.settings import TELEGRAM_BOT_TOKEN
-from habits.models import Habits
+    Запускается после фиксации изменений привычек и раз в минуту beat на случай потерянного запуска.
+    Записи блокируются без SKIP LOCKED: параллельные запуски разбирают пачки по очереди и не создают
+    одну и ту же задачу напоминания дважды.
+    """
+    processed = 0
+    while True:
+        with transaction.atomic():
+            entries = list(
+                ScheduleOutbox.objects.select_for_update()
+                .order_by("pk")
+                .values_list("pk", "habit_id")[: settings.HABITS_SCHEDULE_OUTBOX_BATCH]
+            )
+            if not entries:
+                return processed
+            sync_tasks({habit_id for _, habit_id in entries})
+            ScheduleOutbox.objects.filter(pk__in=[pk for pk, _ in entries]).delete()
+        processed += len(entries)
 
 
 @shared_task
-def send_message(pk) -> None:
-    """Отправка напоминания пользователю."""
-    habit = Habits.objects.get(pk=pk)
-    text = (
-        f"Время для {habit.action} в {habit.place}! "
-        f"Не забудьте {habit.reward if habit.reward else habit.related_habit}."
-    )
-    params = {
-        "text": text,
-        "chat_id": habit.user.tg_chat_id,
-    }
-    requests.get(f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage", params=params)
\ No newline at end of file
+def reconcile_reminder_tasks() -> dict[str, int]:
+    """Удаляет задачи напоминаний без привычек и создает недостающие, запускается beat раз в сутки."""
+    return reconcile_tasks()
@@ -0,0 +1,167 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import requests
+from celery.signals import worker_init
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+from config.task_metrics import task_registry
+
+# Пулы Celery, в которых каждая задача выполняется в отдельном процессе со своим клиентом
+PROCESS_POOLS = ("prefork", "processes")
+
+# Число процессов воркера, между которыми делится TELEGRAM_RATE_LIMIT, задается при старте воркера
+_worker_processes = 1
+
+
+class TokenBucket:
+    """Потокобезопасный ограничитель частоты запросов (token bucket).
+
+    rate - число токенов, добавляемых в секунду, capacity - максимальный размер всплеска.
+    """
+
+    def __init__(self, rate: float, capacity: int | None = None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Блокирует поток, пока не появится свободный токен."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Останавливает выдачу токенов на seconds секунд, например после ответа 429."""
+        with self.lock:
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class TelegramClient:
+    """Клиент Bot API с пулом keep-alive соединений и ограничением частоты отправки."""
+
+    def __init__(self, token: str, base_url: str, rate: float, concurrency: int, timeout: float):
+        self.url = f"{base_url.rstrip('/')}/bot{token}/sendMessage"
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def send_message(self, chat_id: str, text: str) -> requests.Response:
+        """Отправляет одно сообщение, дожидаясь разрешения ограничителя."""
+        self.bucket.acquire()
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = self.session.post(self.url, json={"chat_id": chat_id, "text": text}, timeout=self.timeout)
+            status = str(response.status_code)
+            if response.status_code == 429:
+                # Telegram ограничивает всего бота, поэтому паузу выдерживают все потоки процесса
+                retry_after = get_retry_after(response)
+                self.bucket.pause(1 if retry_after is None else retry_after)
+            return response
+        finally:
+            if settings.METRICS_ENABLED:
+                task_registry.observe_telegram(status, time.perf_counter() - started)
+
+    def send_messages(self, messages: list[tuple[str, str]]) -> list[requests.Response | requests.RequestException]:
+        """Параллельно отправляет пары (chat_id, text) в пределах лимита частоты.
+
+        Ошибки сети не прерывают пачку и возвращаются на месте ответа.
+        """
+
+        def send(message):
+            try:
+                return self.send_message(*message)
+            except requests.RequestException as exc:
+                return exc
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(send, messages))
+
+
+def get_retry_after(response: requests.Response) -> float | None:
+    """Возвращает паузу из ответа 429: parameters.retry_after Bot API или заголовок Retry-After."""
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def get_retry_delay(result: requests.Response | requests.RequestException, attempt: int) -> float | None:
+    """Возвращает задержку перед повтором отправки или None, если повтор бесполезен.
+
+    Для 429 выдерживается retry_after, для ошибок сети и 5xx - экспоненциальная пауза со случайным
+    разбросом, чтобы повторы разных задач не совпадали. Остальные 4xx (бот заблокирован, чат
+    не найден) не исправятся повтором.
+    """
+    backoff = min(settings.HABITS_REMINDER_RETRY_BACKOFF * 2**attempt, settings.HABITS_REMINDER_RETRY_BACKOFF_MAX)
+    backoff *= random.uniform(0.5, 1)
+    if isinstance(result, requests.RequestException):
+        return backoff
+    if result.status_code == 429:
+        retry_after = get_retry_after(result)
+        return backoff if retry_after is None else retry_after
+    if result.status_code >= 500:
+        return backoff
+    return None
+
+
+def set_worker_processes(processes: int) -> None:
+    """Задает число процессов, между которыми делится лимит, и сбрасывает клиент процесса."""
+    global _worker_processes
+    _worker_processes = max(1, processes)
+    get_client.cache_clear()
+
+
+@worker_init.connect
+def split_rate_limit(sender=None, **kwargs):
+    """Делит лимит Telegram между процессами prefork-пула воркера.
+
+    Ограничитель у каждого процесса свой, поэтому без деления воркер с concurrency N отправлял бы
+    до N * TELEGRAM_RATE_LIMIT сообщений в секунду. Сигнал приходит до запуска пула, и процессы
+    наследуют значение при fork.
+    """
+    pool = sender.pool_cls if isinstance(sender.pool_cls, str) else sender.pool_cls.__module__
+    set_worker_processes(sender.concurrency if any(name in pool for name in PROCESS_POOLS) else 1)
+
+
+@lru_cache(maxsize=None)
+def get_client() -> TelegramClient:
+    """Возвращает общий для процесса воркера клиент Telegram с его долей лимита частоты."""
+    return TelegramClient(
+        token=settings.TELEGRAM_BOT_TOKEN,
+        base_url=settings.TELEGRAM_API_URL,
+        rate=settings.TELEGRAM_RATE_LIMIT / _worker_processes,
+        concurrency=settings.TELEGRAM_CONCURRENCY,
+        timeout=settings.TELEGRAM_TIMEOUT,
+    )
+
+
+@receiver(setting_changed)
+def reset_client(setting, **kwargs):
+    """Пересоздает клиент при изменении настроек Telegram (например, в тестах)."""
+    if setting.startswith("TELEGRAM_"):
+        get_client.cache_clear()
@@ -1,8 +1,57 @@
+import csv
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from datetime import time as dt_time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from celery.worker.request import Request
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django_celery_beat.models import CrontabSchedule, PeriodicTask
+from kombu import Connection
+from kombu.exceptions import OperationalError
 from rest_framework import status
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import BaseSerializer
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-from habits.models import Habits
+from config.celery import app as celery_app
+from config.metrics import registry
+from config.parsers import ORJSONParser
+from config.renderers import ORJSONRenderer
+from config.task_metrics import collect_task_metrics, task_registry
+from habits.benchmarks import WORKLOADS, HabitsBenchmark, compare
+from habits.cache import REMINDER_PAYLOAD_KEY, get_reminder_payloads
+from habits.models import FailedReminder, HabitCompletion, Habits, HabitStats, ScheduleOutbox
+from habits.paginators import HabitsCursorPagination
+from habits.seeding import COPY_NULL, SEED_PASSWORD, get_copy_rows, seed_habits
+from habits.serializers import HabitsSerializer
+from habits.services import (SCHEDULE_LOCK_KEY, clear_schedule_cache, create_tasks, find_or_create_schedule,
+                             get_habit_next_fire_at, get_next_fire_at, get_schedule_id, reconcile_tasks,
+                             warm_schedule_cache)
+from habits.stats import count_user_habits
+from habits.tasks import dispatch_due_reminders, drain_schedule_outbox, send_message, send_messages_bulk
+from habits.telegram import TokenBucket, get_client, set_worker_processes, split_rate_limit
+from habits.validators import HabitValidator
+from habits.views import HabitListAPIView, PublicHabitListAPIView
+from users.authentication import CachedJWTAuthentication
 from users.models import User
 
 
@@ -20,7 +69,7 @@ class HabitTestCase(APITestCase):
             time_success=90,
             action="Читать книгу",
             is_pleasant=False,
-            fk_habits=None,
+            related_habit=None,
             period=1,
             reward="Чашка чая",
             max_time_processing=100,
@@ -34,7 +83,7 @@ class HabitTestCase(APITestCase):
             time_success=60,
             action="Гулять",
             is_pleasant=True,
-            fk_habits=None,
+            related_habit=None,
             period=1,
             reward="",
             max_time_processing=80,
@@ -47,7 +96,7 @@ class HabitTestCase(APITestCase):
             time_success=120,
             action="Тренироваться",
             is_pleasant=False,
-            fk_habits=self.pleasant_habit_for_related,
+            related_habit=self.pleasant_habit_for_related,
             period=7,
             reward="",
             max_time_processing=150,
@@ -61,7 +110,7 @@ class HabitTestCase(APITestCase):
             time_success=30,
             action="Слушать музыку",
             is_pleasant=True,
-            fk_habits=None,
+            related_habit=None,
             period=1,
             reward="",
             max_time_processing=50,
@@ -75,7 +124,7 @@ class HabitTestCase(APITestCase):
             time_success=45,
             action="Пить воду",
             is_pleasant=False,
-            fk_habits=None,
+            related_habit=None,
             period=1,
             reward="Перерыв",
             max_time_processing=60,
@@ -88,7 +137,7 @@ class HabitTestCase(APITestCase):
             time_success=20,
             action="Медитировать",
             is_pleasant=True,
-            fk_habits=None,
+            related_habit=None,
             period=1,
             reward="",
             max_time_processing=30,
@@ -117,7 +166,7 @@ class HabitTestCase(APITestCase):
 
         habit = Habits.objects.get(place="Работа")
         self.assertEqual(habit.reward, "Кофе")
-        self.assertIsNone(habit.fk_habits)
+        self.assertIsNone(habit.related_habit)
 
     def test_habit_create_good_habit_with_related_habit(self):
         """Тест создания полезной привычки со связанной привычкой"""
@@ -127,7 +176,7 @@ class HabitTestCase(APITestCase):
             "time_success": 60,
             "action": "Читать",
             "is_pleasant": False,
-            "fk_habits": self.pleasant_habit.id,
+            "related_habit": self.pleasant_habit.id,
             "period": 7,
             "reward": "",
             "max_time_processing": 80,
@@ -138,8 +187,9 @@ class HabitTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Habits.objects.count(), 7)
 
-        habit = Habits.objects.get(place="Спальня")
-        self.assertEqual(habit.fk_habits, self.pleasant_habit)
+        # В фикстурах есть привычка другого пользователя с тем же местом
+        habit = Habits.objects.get(user=self.user, place="Спальня")
+        self.assertEqual(habit.related_habit, self.pleasant_habit)
         self.assertEqual(habit.reward, "")
 
     def test_habit_create_time_success_error(self):
@@ -158,7 +208,7 @@ class HabitTestCase(APITestCase):
         response = self.client.post(url, body, format="json")
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn("Время выполнения не должно превышать 120 секунд", str(response.content))
+        self.assertIn("Время выполнения не должно превышать 120 секунд", response.content.decode())
 
     def test_habit_create_related_habit_error(self):
         """Тест ошибки при выборе неправильной связанной привычки"""
@@ -168,7 +218,7 @@ class HabitTestCase(APITestCase):
             "time_success": 90,
             "action": "Тест",
             "is_pleasant": False,
-            "fk_habits": self.good_habit_with_reward.id,  # Не приятная привычка
+            "related_habit": self.good_habit_with_reward.id,  # Не приятная привычка
             "period": 1,
             "reward": "",
             "max_time_processing": 100,
@@ -177,7 +227,9 @@ class HabitTestCase(APITestCase):
         response = self.client.post(url, body, format="json")
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn("В качестве связанной привычки можно выбрать только приятную привычку", str(response.content))
+        self.assertIn(
+            "В качестве связанной привычки можно выбрать только приятную привычку", response.content.decode()
+        )
 
     def test_habit_create_reward_and_related_error(self):
         """Тест ошибки при одновременном выборе вознаграждения и связанной привычки"""
@@ -187,7 +239,7 @@ class HabitTestCase(APITestCase):
             "time_success": 90,
             "action": "Тест",
             "is_pleasant": False,
-            "fk_habits": self.pleasant_habit.id,
+            "related_habit": self.pleasant_habit.id,
             "period": 1,
             "reward": "Тест",
             "max_time_processing": 100,
@@ -196,7 +248,7 @@ class HabitTestCase(APITestCase):
         response = self.client.post(url, body, format="json")
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn("Нельзя одновременно выбирать и связанную привычку и вознаграждение", str(response.content))
+        self.assertIn("Нельзя одновременно выбирать и связанную привычку и вознаграждение", response.content.decode())
 
     def test_habit_create_pleasant_habit_with_reward_error(self):
         """Тест ошибки при создании приятной привычки с вознаграждением"""
@@ -214,7 +266,7 @@ class HabitTestCase(APITestCase):
         response = self.client.post(url, body, format="json")
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn("Приятная привычка не может иметь вознаграждения", str(response.content))
+        self.assertIn("Приятная привычка не может иметь вознаграждения", response.content.decode())
 
     def test_habit_create_pleasant_habit_with_related_error(self):
         """Тест ошибки при создании приятной привычки со связанной привычкой"""
@@ -224,7 +276,7 @@ class HabitTestCase(APITestCase):
             "time_success": 30,
             "action": "Тест",
             "is_pleasant": True,
-            "fk_habits": self.pleasant_habit.id,
+            "related_habit": self.pleasant_habit.id,
             "period": 1,
             "reward": "",
             "max_time_processing": 40,
@@ -233,7 +285,7 @@ class HabitTestCase(APITestCase):
         response = self.client.post(url, body, format="json")
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn("Приятная привычка не может быть связана с другой привычкой", str(response.content))
+        self.assertIn("Приятная привычка не может быть связана с другой привычкой", response.content.decode())
 
     def test_habit_create_good_habit_no_reward_or_related_error(self):
         """Тест ошибки при создании полезной привычки без вознаграждения и связанной привычки"""
@@ -252,7 +304,7 @@ class HabitTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn(
-            "Полезная привычка должна иметь либо вознаграждение, либо связанную привычку", str(response.content)
+            "Полезная привычка должна иметь либо вознаграждение, либо связанную привычку", response.content.decode()
         )
 
     def test_habit_create_pleasant_habit_success(self):
@@ -298,7 +350,7 @@ class HabitTestCase(APITestCase):
         url = reverse("habits:habit-detail", args=(self.private_habit_user2.id,))
         response = self.client.get(url)
 
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_habit_list_own_habits(self):
         """Тест получения списка своих привычек"""
@@ -329,7 +381,7 @@ class HabitTestCase(APITestCase):
         body = {"place": "Попытка изменить"}
         response = self.client.patch(url, body, format="json")
 
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_habit_delete_own_habit(self):
         """Тест удаления своей привычки"""
@@ -344,7 +396,7 @@ class HabitTestCase(APITestCase):
         url = reverse("habits:habit-delete", args=(self.public_habit_user2.id,))
         response = self.client.delete(url)
 
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(Habits.objects.count(), 6)
 
     def test_public_habit_list(self):
@@ -353,5 +405,1179 @@ class HabitTestCase(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        # Должны видеть 2 публичные привычки (одна своя, одна другого пользователя)
-        self.assertEqual(len(response.data), 2)
+        # Должны видеть 3 публичные привычки (две свои, одна другого пользователя)
+        self.assertEqual(len(response.json()["results"]), 3)
+
+
+class ReminderDispatcherTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email="tg@user.ru", chat_id="100")
+        self.user_without_chat = User.objects.create(email="notg@user.ru")
+        past = timezone.now() - timedelta(minutes=1)
+
+        self.due_habit = Habits.objects.create(
+            user=self.user, place="Дом", action="Читать", period=Habits.DAILY, reward="Чай", next_fire_at=past
+        )
+        self.due_habit_without_chat = Habits.objects.create(
+            user=self.user_without_chat,
+            place="Дом",
+            action="Бегать",
+            period=Habits.WEEKLY,
+            reward="Чай",
+            next_fire_at=past,
+        )
+        self.future_habit = Habits.objects.create(
+            user=self.user,
+            place="Парк",
+            action="Гулять",
+            reward="Чай",
+            next_fire_at=timezone.now() + timedelta(hours=1),
+        )
+
+    def test_get_next_fire_at(self):
+        """Тест расчета ближайшего напоминания для каждой периодичности"""
+        moscow = ZoneInfo("Europe/Moscow")
+        after = datetime(2025, 9, 10, 12, 0, tzinfo=moscow)  # среда
+
+        self.assertEqual(get_next_fire_at(Habits.DAILY, after), datetime(2025, 9, 11, 9, 0, tzinfo=moscow))
+        self.assertEqual(get_next_fire_at(Habits.WEEKLY, after), datetime(2025, 9, 15, 9, 0, tzinfo=moscow))
+        self.assertEqual(get_next_fire_at(Habits.MONTHLY, after), datetime(2025, 10, 1, 9, 0, tzinfo=moscow))
+        self.assertEqual(
+            get_next_fire_at(Habits.DAILY, datetime(2025, 9, 10, 8, 59, tzinfo=moscow)),
+            datetime(2025, 9, 10, 9, 0, tzinfo=moscow),
+        )
+
+    def test_dispatch_due_reminders(self):
+        """Тест рассылки напоминаний по наступившему next_fire_at"""
+        with patch("habits.tasks.group") as group:
+            sent = dispatch_due_reminders()
+
+        self.assertEqual(sent, 1)
+        self.assertEqual([signature.args for signature in group.call_args.args[0]], [([self.due_habit.pk],)])
+        group.return_value.apply_async.assert_called_once()
+
+        for habit in (self.due_habit, self.due_habit_without_chat):
+            habit.refresh_from_db()
+            self.assertGreater(habit.next_fire_at, timezone.now())
+
+    def test_dispatch_due_reminders_nothing_due(self):
+        """Тест повторного запуска диспетчера в ту же минуту"""
+        with patch("habits.tasks.group") as group:
+            dispatch_due_reminders()
+            self.assertEqual(dispatch_due_reminders(), 0)
+        group.assert_called_once()
+
+    @override_settings(HABITS_REMINDER_MODE="periodic_task")
+    def test_dispatch_due_reminders_periodic_task_mode(self):
+        """Тест диспетчера в режиме periodic_task: напоминания отправляют задачи привычек"""
+        with patch("habits.tasks.group") as group:
+            self.assertEqual(dispatch_due_reminders(), 0)
+        group.assert_not_called()
+        self.assertEqual(Habits.objects.filter(next_fire_at__lte=timezone.now()).count(), 2)
+
+    def test_schedule_reminders_command(self):
+        """Тест назначения напоминаний привычкам, созданным до перехода в режим диспетчера"""
+        Habits.objects.update(next_fire_at=None)
+        pleasant = Habits.objects.create(user=self.user, place="Дом", action="Отдыхать", is_pleasant=True)
+        create_tasks([self.due_habit])
+
+        out = StringIO()
+        call_command("schedule_reminders", stdout=out)
+
+        self.assertIn("Назначено напоминаний: 3", out.getvalue())
+        self.assertFalse(Habits.objects.filter(is_pleasant=False, next_fire_at__lte=timezone.now()).exists())
+        self.assertFalse(Habits.objects.filter(is_pleasant=False, next_fire_at=None).exists())
+        pleasant.refresh_from_db()
+        self.assertIsNone(pleasant.next_fire_at)
+        self.assertFalse(PeriodicTask.objects.filter(name=f"Sending reminder {self.due_habit.pk}").exists())
+
+    @override_settings(HABITS_REMINDER_MAX_PER_MINUTE=1)
+    def test_dispatch_due_reminders_per_minute_cap(self):
+        """Тест ограничения рассылки за минуту: остаток уходит следующим запуском"""
+        with patch("habits.tasks.group"):
+            self.assertEqual(dispatch_due_reminders(), 1)
+            self.assertEqual(Habits.objects.filter(next_fire_at__lte=timezone.now()).count(), 1)
+            dispatch_due_reminders()
+        self.assertFalse(Habits.objects.filter(next_fire_at__lte=timezone.now()).exists())
+
+    @override_settings(HABITS_REMINDER_JITTER=600)
+    def test_user_timezone_and_reminder_time(self):
+        """Тест расчета напоминания в часовом поясе и во время пользователя с разбросом"""
+        self.user.timezone = "Asia/Vladivostok"
+        self.user.reminder_time = dt_time(7, 30)
+        after = datetime(2025, 9, 10, 12, 0, tzinfo=ZoneInfo("Europe/Moscow"))  # 19:00 во Владивостоке
+        fire_at = get_habit_next_fire_at(False, Habits.DAILY, after, self.user)
+
+        expected = datetime(2025, 9, 11, 7, 30, tzinfo=ZoneInfo("Asia/Vladivostok"))
+        self.assertTrue(expected <= fire_at <= expected + timedelta(minutes=10))
+        self.assertIsNone(get_habit_next_fire_at(True, Habits.DAILY, after, self.user))
+
+    @override_settings(HABITS_REMINDER_JITTER=0)
+    def test_reschedule_on_user_timezone_change(self):
+        """Тест переноса напоминаний при смене часового пояса пользователя"""
+        self.user.timezone = "America/New_York"
+        self.user.save(update_fields=["timezone"])
+
+        self.due_habit.refresh_from_db()
+        local = self.due_habit.next_fire_at.astimezone(ZoneInfo("America/New_York"))
+        self.assertEqual((local.hour, local.minute), (9, 0))
+
+
+@contextmanager
+def eager_tasks():
+    """Выполняет задачи, поставленные через delay/apply_async, сразу в процессе теста, без брокера."""
+    celery_app.conf.task_always_eager = True
+    try:
+        yield
+    finally:
+        celery_app.conf.task_always_eager = False
+
+
+def run_through_broker(task, *args):
+    """Публикует задачу в брокер в памяти и выполняет полученное сообщение так же, как воркер.
+
+    В отличие от eager-режима срабатывают все сигналы пути сообщения, от before_task_publish до task_postrun.
+    """
+    with Connection("memory://") as connection:
+        with celery_app.amqp.Producer(connection) as producer:
+            task.apply_async(args, producer=producer)
+        with connection.SimpleQueue(celery_app.conf.task_default_queue) as queue:
+            message = queue.get(timeout=1)
+        return Request(message, app=celery_app, task=task).execute()
+
+
+class TelegramStubHandler(BaseHTTPRequestHandler):
+    """Заглушка Bot API: запоминает отправленные сообщения и отвечает как Telegram."""
+
+    messages = []
+    # Очередь ответов с ошибкой: (статус, тело), после нее заглушка отвечает успехом
+    errors = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        status_code, response = self.errors.pop(0) if self.errors else (200, {"ok": True, "result": {}})
+        if status_code == 200:
+            self.messages.append(body)
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TelegramClientTestCase(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), TelegramStubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        TelegramStubHandler.messages = []
+        TelegramStubHandler.errors = []
+        self.user = User.objects.create(email="tg@user.ru", chat_id="100")
+        self.pleasant_habit = Habits.objects.create(user=self.user, place="Парк", action="Гулять", is_pleasant=True)
+        self.habits = [
+            Habits.objects.create(user=self.user, place="Дом", action="Читать", reward="Чай"),
+            Habits.objects.create(user=self.user, place="Зал", action="Бегать", related_habit=self.pleasant_habit),
+        ]
+
+    def test_send_messages_bulk(self):
+        """Тест пакетной отправки напоминаний через заглушку Bot API"""
+        host, port = self.server.server_address
+        with override_settings(TELEGRAM_API_URL=f"http://{host}:{port}", TELEGRAM_BOT_TOKEN="token"):
+            sent = send_messages_bulk([habit.pk for habit in self.habits])
+
+        self.assertEqual(sent, 2)
+        self.assertCountEqual(
+            [message["text"] for message in TelegramStubHandler.messages],
+            ["Время для Читать в Дом! Не забудьте Чай.", "Время для Бегать в Зал! Не забудьте Гулять в Парк."],
+        )
+        self.assertEqual({message["chat_id"] for message in TelegramStubHandler.messages}, {"100"})
+
+    @override_settings(METRICS_ENABLED=True, METRICS_PUBLISH_INTERVAL=0, METRICS_TOKEN="")
+    def test_task_metrics(self):
+        """Тест метрик задачи и запроса к Telegram, опубликованных в кэш для /metrics"""
+        task_registry.clear()
+        host, port = self.server.server_address
+        with override_settings(TELEGRAM_API_URL=f"http://{host}:{port}", TELEGRAM_BOT_TOKEN="token"):
+            run_through_broker(send_message, self.habits[0].pk)
+
+        self.client.force_authenticate(user=self.user)
+        content = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('celery_tasks_total{task="habits.tasks.send_message",state="SUCCESS"} 1', content)
+        self.assertIn('celery_task_runtime_seconds_count{task="habits.tasks.send_message"} 1', content)
+        self.assertIn('telegram_requests_total{status="200"} 1', content)
+
+        # Время постановки в очередь дошло из заголовка сообщения до task.request воркера
+        queue_lag = collect_task_metrics()["tasks"]["habits.tasks.send_message"]["queue_lag"]
+        self.assertEqual((queue_lag["count"], queue_lag["buckets"][0]), (1, 1))
+
+    def test_send_message_retries(self):
+        """Тест повтора отправки после 429 с retry_after и 5xx"""
+        host, port = self.server.server_address
+        TelegramStubHandler.errors = [
+            (429, {"ok": False, "error_code": 429, "parameters": {"retry_after": 0}}),
+            (502, {"ok": False}),
+        ]
+        with override_settings(TELEGRAM_API_URL=f"http://{host}:{port}", HABITS_REMINDER_RETRY_BACKOFF=0):
+            with patch("habits.tasks.send_message.retry", wraps=send_message.retry) as retry:
+                send_message.apply((self.habits[0].pk,)).get()
+
+        self.assertEqual([call.kwargs["countdown"] for call in retry.call_args_list], [0, 0])
+        self.assertEqual(len(TelegramStubHandler.messages), 1)
+        self.assertFalse(FailedReminder.objects.exists())
+
+    def test_failed_reminders_and_replay(self):
+        """Тест сохранения неотправленных напоминаний и их повторной отправки командой"""
+        host, port = self.server.server_address
+        TelegramStubHandler.errors = [
+            (403, {"ok": False, "description": "Forbidden: bot was blocked by the user"}),
+            (500, {"ok": False}),
+            (500, {"ok": False}),
+        ]
+        with override_settings(
+            TELEGRAM_API_URL=f"http://{host}:{port}", HABITS_REMINDER_RETRY_BACKOFF=0, HABITS_REMINDER_MAX_RETRIES=1
+        ):
+            send_messages_bulk.apply(([habit.pk for habit in self.habits],)).get()
+            self.assertEqual(
+                sorted(FailedReminder.objects.values_list("status_code", "attempts")), [(403, 1), (500, 2)]
+            )
+            self.assertFalse(TelegramStubHandler.messages)
+
+            with eager_tasks(), self.captureOnCommitCallbacks(execute=True):
+                call_command("replay_reminders", rate=1000, stdout=StringIO())
+
+        self.assertFalse(FailedReminder.objects.exists())
+        self.assertEqual(len(TelegramStubHandler.messages), 2)
+
+    def test_rate_limit_split_between_worker_processes(self):
+        """Тест деления лимита Telegram между процессами prefork-пула воркера"""
+        self.addCleanup(set_worker_processes, 1)
+        split_rate_limit(sender=SimpleNamespace(pool_cls="prefork", concurrency=4))
+        self.assertEqual(get_client().bucket.rate, settings.TELEGRAM_RATE_LIMIT / 4)
+
+        split_rate_limit(sender=SimpleNamespace(pool_cls="threads", concurrency=4))
+        self.assertEqual(get_client().bucket.rate, settings.TELEGRAM_RATE_LIMIT)
+
+    def test_token_bucket_limits_rate(self):
+        """Тест ограничения частоты: сверх емкости токены выдаются со скоростью rate"""
+        bucket = TokenBucket(rate=20, capacity=1)
+        started = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+
+class ReminderPayloadCacheTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        clear_schedule_cache()
+        self.user = User.objects.create(email="tg@user.ru", chat_id="100")
+        self.pleasant_habit = Habits.objects.create(user=self.user, place="Парк", action="Гулять", is_pleasant=True)
+        self.habit = Habits.objects.create(
+            user=self.user, place="Зал", action="Бегать", related_habit=self.pleasant_habit
+        )
+
+    def test_payload_refreshed_on_save(self):
+        """Тест обновления данных напоминания после фиксации сохранения привычки"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habit.place = "Стадион"
+            self.habit.save()
+            self.assertIsNone(cache.get(REMINDER_PAYLOAD_KEY.format(pk=self.habit.pk)))
+
+        with self.assertNumQueries(0):
+            payloads = get_reminder_payloads([self.habit.pk])
+        self.assertEqual(payloads[self.habit.pk]["text"], "Время для Бегать в Стадион! Не забудьте Гулять в Парк.")
+
+    def test_payload_kept_on_rollback(self):
+        """Тест отката транзакции: в кэше не остаются данные, которых нет в базе"""
+        get_reminder_payloads([self.habit.pk])
+        with self.captureOnCommitCallbacks() as callbacks, transaction.atomic():
+            self.habit.place = "Стадион"
+            self.habit.save()
+            transaction.set_rollback(True)
+
+        self.assertFalse(callbacks)
+        self.assertEqual(
+            get_reminder_payloads([self.habit.pk])[self.habit.pk]["text"],
+            "Время для Бегать в Зал! Не забудьте Гулять в Парк.",
+        )
+
+    def test_payload_reset_on_related_and_user_change(self):
+        """Тест сброса данных напоминания при изменении связанной привычки и чата пользователя"""
+        get_reminder_payloads([self.habit.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pleasant_habit.action = "Плавать"
+            self.pleasant_habit.save()
+        self.assertIsNone(cache.get(REMINDER_PAYLOAD_KEY.format(pk=self.habit.pk)))
+
+        with self.assertNumQueries(1):
+            payloads = get_reminder_payloads([self.habit.pk, self.pleasant_habit.pk + 100])
+        self.assertEqual(list(payloads), [self.habit.pk])
+        self.assertEqual(payloads[self.habit.pk]["text"], "Время для Бегать в Зал! Не забудьте Плавать в Парк.")
+
+        self.user.chat_id = "200"
+        self.user.save()
+        self.assertEqual(get_reminder_payloads([self.habit.pk])[self.habit.pk]["chat_id"], "200")
+
+    def test_payload_reset_on_related_bulk_update_and_delete(self):
+        """Тест сброса данных напоминания при пакетном изменении и удалении связанной привычки"""
+        self.client.force_authenticate(user=self.user)
+        get_reminder_payloads([self.habit.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse("habits:habit-bulk-update"),
+                [{"id": self.pleasant_habit.pk, "action": "Плавать"}],
+                format="json",
+            )
+        self.assertEqual(
+            get_reminder_payloads([self.habit.pk])[self.habit.pk]["text"],
+            "Время для Бегать в Зал! Не забудьте Плавать в Парк.",
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pleasant_habit.delete()
+        self.assertIsNone(cache.get(REMINDER_PAYLOAD_KEY.format(pk=self.habit.pk)))
+        self.assertNotIn("Плавать", get_reminder_payloads([self.habit.pk])[self.habit.pk]["text"])
+
+
+class HabitListQueryPlanTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email="user@user.ru")
+        for i in range(12):
+            Habits.objects.create(user=self.user, place="Дом", action=f"Привычка {i}", reward="Чай", is_public=i % 2)
+        self.client.force_authenticate(user=self.user)
+
+    def assertUsesIndex(self, queryset, index_name):
+        """Проверяет по EXPLAIN, что запрос идет по индексу, а не полным перебором таблицы."""
+        if connection.vendor == "postgresql":
+            # На маленькой тестовой таблице планировщик предпочтет seq scan, как бы не был хорош индекс
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        self.assertIn(index_name, queryset.explain())
+
+    def test_habit_list_query_plan(self):
+        """Тест списка своих привычек: фиксированное число запросов по индексу (user, -created_at)"""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("habits:habit-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        view = HabitListAPIView()
+        view.request = SimpleNamespace(user=self.user)
+        queryset = view.get_queryset().order_by(*HabitsCursorPagination.ordering)
+        self.assertUsesIndex(queryset, "habits_user_created_idx")
+
+    def test_public_habit_list_query_plan(self):
+        """Тест ленты публичных привычек: один запрос по частичному индексу is_public"""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("habits:public-habit-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        queryset = PublicHabitListAPIView().get_queryset().order_by(*HabitsCursorPagination.ordering)
+        self.assertUsesIndex(queryset, "habits_public_created_idx")
+
+    def test_cursor_pagination(self):
+        """Тест keyset-пагинации: страницы без пропусков и повторов при одинаковом created_at"""
+        Habits.objects.filter(user=self.user, pk__lte=Habits.objects.order_by("pk")[5].pk).update(
+            created_at=timezone.now()
+        )
+        expected = list(
+            Habits.objects.filter(user=self.user).order_by("-created_at", "-pk").values_list("pk", flat=True)
+        )
+
+        url, pages = reverse("habits:habit-list"), []
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            pages.append(response.data)
+            url = response.data["next"]
+
+        self.assertEqual([len(page["results"]) for page in pages], [5, 5, 2])
+        self.assertEqual([habit["id"] for page in pages for habit in page["results"]], expected)
+
+        response = self.client.get(pages[2]["previous"])
+        self.assertEqual(response.data["results"], pages[1]["results"])
+        self.assertEqual(self.client.get(reverse("habits:habit-list"), {"cursor": "bad"}).status_code, 404)
+
+    def test_values_serializer_matches_model_serializer(self):
+        """Тест быстрого сериализатора: ответ совпадает с HabitsSerializer"""
+        response = self.client.get(reverse("habits:habit-list"))
+        habits = Habits.objects.filter(pk__in=[habit["id"] for habit in response.data["results"]])
+        expected = sorted(HabitsSerializer(habits, many=True).data, key=lambda habit: habit["id"])
+        self.assertEqual(sorted(response.data["results"], key=lambda habit: habit["id"]), expected)
+
+    def test_sparse_fieldsets(self):
+        """Тест параметра fields: только запрошенные поля, неизвестные поля - ошибка"""
+        url = reverse("habits:habit-list")
+        response = self.client.get(url, {"fields": "action,place"})
+        self.assertEqual(list(response.data["results"][0]), ["action", "place"])
+        self.assertEqual(len(self.client.get(response.data["next"]).data["results"]), 5)
+
+        response = self.client.get(reverse("habits:public-habit-list"), {"fields": "action"})
+        self.assertEqual({tuple(habit) for habit in response.json()["results"]}, {("action",)})
+
+        response = self.client.get(url, {"fields": "action,password"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("password", response.data["fields"])
+        self.assertEqual(self.client.get(reverse("habits:public-habit-list"), {"fields": "place"}).status_code, 400)
+
+
+class PublicFeedCacheTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="user@user.ru")
+        self.public_habit = Habits.objects.create(user=self.user, place="Дом", action="Читать", is_public=True)
+        self.private_habit = Habits.objects.create(user=self.user, place="Парк", action="Гулять")
+        self.url = reverse("habits:public-habit-list")
+        self.client.force_authenticate(user=self.user)
+
+    def test_public_feed_cached_with_etag(self):
+        """Тест отдачи ленты из кэша и ответа 304 по If-None-Match"""
+        response = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached["ETag"], response["ETag"])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_public_feed_invalidated_selectively(self):
+        """Тест сброса кэша ленты только при изменениях, видимых в ней, и только после фиксации транзакции"""
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.private_habit.place = "Сад"
+            self.private_habit.save()
+            self.public_habit.reward = "Чай"
+            self.public_habit.save()
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+        # Место не выводится в ленте, но по нему ищут, поэтому закэшированный поиск устаревает
+        self.client.get(self.url, {"search": "Офис"})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.public_habit.place = "Офис"
+            self.public_habit.save()
+        self.assertEqual(len(self.client.get(self.url, {"search": "Офис"}).json()["results"]), 1)
+
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.private_habit.is_public = True
+            self.private_habit.save()
+            # До фиксации транзакции лента отдается из кэша и не кэшируется заново со старыми данными
+            with self.assertNumQueries(0):
+                self.client.get(self.url)
+        for callback in callbacks:
+            callback()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.json()["results"]), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.public_habit.delete()
+        self.assertEqual(len(self.client.get(self.url).json()["results"]), 1)
+
+
+class HabitBulkTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="user@user.ru")
+        self.user2 = User.objects.create(email="user2@user.ru")
+        self.pleasant_habit = Habits.objects.create(user=self.user, place="Парк", action="Гулять", is_pleasant=True)
+        self.habit = Habits.objects.create(user=self.user, place="Дом", action="Читать", reward="Чай")
+        self.habit_user2 = Habits.objects.create(user=self.user2, place="Офис", action="Пить воду", reward="Чай")
+        self.client.force_authenticate(user=self.user)
+
+    def make_payload(self, count):
+        return [
+            {"place": "Зал", "action": f"Отжимания {i}", "period": 1, "related_habit": self.pleasant_habit.pk}
+            for i in range(count)
+        ]
+
+    def test_bulk_create_constant_queries(self):
+        """Тест пакетного создания: число запросов не зависит от размера пачки"""
+        url = reverse("habits:habit-bulk-create")
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post(url, self.make_payload(2), format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(url, self.make_payload(10), format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Habits.objects.filter(user=self.user, related_habit=self.pleasant_habit).count(), 12)
+        self.assertTrue(all(habit["next_fire_at"] for habit in response.json()))
+
+    def test_bulk_create_validation_error(self):
+        """Тест пакетного создания: ошибка в одном элементе отменяет всю пачку"""
+        payload = self.make_payload(2) + [{"place": "Зал", "action": "Бегать", "period": 1, "related_habit": 10**6}]
+        response = self.client.post(reverse("habits:habit-bulk-create"), payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()[:2], [{}, {}])
+        self.assertIn("related_habit", response.json()[2])
+        self.assertEqual(Habits.objects.count(), 3)
+
+        payload = self.make_payload(1) + [{"place": "Зал", "action": "Бегать", "period": 1}]
+        response = self.client.post(reverse("habits:habit-bulk-create"), payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json(),
+            [
+                {},
+                {"non_field_errors": ["Полезная привычка должна иметь либо вознаграждение, либо связанную привычку."]},
+            ],
+        )
+
+    def test_bulk_update(self):
+        """Тест пакетного обновления своих привычек"""
+        url = reverse("habits:habit-bulk-update")
+        payload = [{"id": self.habit.pk, "place": "Библиотека"}, {"id": self.pleasant_habit.pk, "place": "Лес"}]
+        response = self.client.patch(url, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.habit.refresh_from_db()
+        self.pleasant_habit.refresh_from_db()
+        self.assertEqual((self.habit.place, self.habit.reward), ("Библиотека", "Чай"))
+        self.assertEqual(self.pleasant_habit.place, "Лес")
+
+        response = self.client.patch(url, [{"id": self.habit_user2.pk, "place": "Дом"}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete(self):
+        """Тест пакетного удаления: чужие привычки не удаляются"""
+        response = self.client.delete(
+            reverse("habits:habit-bulk-delete"), {"ids": [self.habit.pk, self.habit_user2.pk]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Habits.objects.filter(pk=self.habit.pk).exists())
+        self.assertTrue(Habits.objects.filter(pk=self.habit_user2.pk).exists())
+
+
+class HabitValidatorTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email="user@user.ru")
+        self.pleasant_habit = Habits.objects.create(user=self.user, place="Парк", action="Гулять", is_pleasant=True)
+        self.good_habit = Habits.objects.create(user=self.user, place="Дом", action="Читать", reward="Чай")
+        self.validator = HabitValidator()
+        self.items = [
+            {"period": 1, "related_habit": self.pleasant_habit.pk},
+            {"period": 1, "related_habit": self.good_habit.pk},
+            {"period": 1, "related_habit": self.pleasant_habit.pk, "reward": "Чай"},
+            {"period": 1, "reward": "Чай", "time_success": 150},
+            {"period": 1, "related_habit": 10**6},
+        ]
+
+    def test_validate_many_single_query(self):
+        """Тест проверки списка: один запрос на все связанные привычки, без запросов на сами правила"""
+        with self.assertNumQueries(1):
+            errors = self.validator.validate_many(self.items)
+
+        self.assertEqual(errors[0], {})
+        self.assertEqual(list(errors[4]), ["related_habit"])
+
+        related_habits = {habit.pk: habit for habit in (self.pleasant_habit, self.good_habit)}
+        with self.assertNumQueries(0):
+            self.assertEqual(self.validator.validate_many(self.items[:4], related_habits), errors[:4])
+
+    def test_validate_many_matches_single_object(self):
+        """Тест совпадения ошибок списка с проверкой одного объекта"""
+        errors = self.validator.validate_many(self.items[:4])
+
+        for attrs, error in zip(self.items[:4], errors):
+            if attrs.get("related_habit"):
+                attrs = {**attrs, "related_habit": Habits.objects.get(pk=attrs["related_habit"])}
+            try:
+                self.validator(attrs)
+            except ValidationError as exc:
+                self.assertEqual(error, {"non_field_errors": exc.detail})
+            else:
+                self.assertEqual(error, {})
+
+
+class HabitWritePathTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        clear_schedule_cache()
+        self.user = User.objects.create(email="tg@user.ru", chat_id="100")
+        self.client.force_authenticate(user=self.user)
+        self.body = {"place": "Дом", "action": "Читать", "period": 1, "reward": "Чай"}
+
+    def get_habit_writes(self, queries):
+        return [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith(("INSERT", "UPDATE")) and '"habits_habits"' in query["sql"]
+        ]
+
+    def test_create_single_write(self):
+        """Тест создания привычки одной записью вместе с расписанием"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("habits:habit-create"), self.body, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(self.get_habit_writes(queries)), 1)
+        self.assertIsNotNone(Habits.objects.get(pk=response.data["id"]).next_fire_at)
+
+    @override_settings(HABITS_REMINDER_MODE="periodic_task")
+    def test_update_rewrites_schedule_only_on_period_change(self):
+        """Тест обновления: задача напоминания пересоздается только при смене периодичности"""
+        pk = self.client.post(reverse("habits:habit-create"), self.body, format="json").data["id"]
+        drain_schedule_outbox()
+        task = PeriodicTask.objects.get(name=f"Sending reminder {pk}")
+        url = reverse("habits:habit-update", args=(pk,))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(url, {"place": "Парк"}, format="json")
+        self.assertEqual(len(self.get_habit_writes(queries)), 1)
+        self.assertFalse(ScheduleOutbox.objects.exists())
+
+        self.client.patch(url, {"period": 7}, format="json")
+        drain_schedule_outbox()
+        self.assertFalse(PeriodicTask.objects.filter(pk=task.pk).exists())
+        self.assertEqual(PeriodicTask.objects.get(name=f"Sending reminder {pk}").crontab.day_of_week, "1")
+
+    def test_owner_scoped_lookups(self):
+        """Тест выборки по id и владельцу: чужая привычка не загружается и не удаляется, число запросов удаления"""
+        pk = self.client.post(reverse("habits:habit-create"), self.body, format="json").data["id"]
+        other = Habits.objects.create(user=User.objects.create(email="other@user.ru"), place="Офис", action="Бегать")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("habits:habit-detail", args=(pk,)))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertIn(f'"user_id" = {self.user.pk}', queries[0]["sql"])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(reverse("habits:habit-delete", args=(other.pk,)))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Habits.objects.filter(pk=other.pk).exists())
+
+        # Выборка удаляемой и ссылающихся привычек, три каскада, SET NULL, DELETE, статистика и savepoint
+        with self.assertNumQueries(10):
+            response = self.client.delete(reverse("habits:habit-delete", args=(pk,)))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    @override_settings(HABITS_REMINDER_MODE="periodic_task")
+    def test_delete_removes_schedule(self):
+        """Тест удаления привычки вместе с задачей напоминания"""
+        pk = self.client.post(reverse("habits:habit-create"), self.body, format="json").data["id"]
+        drain_schedule_outbox()
+        response = self.client.delete(reverse("habits:habit-delete", args=(pk,)))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Habits.objects.filter(pk=pk).exists())
+        drain_schedule_outbox()
+        self.assertFalse(PeriodicTask.objects.filter(name=f"Sending reminder {pk}").exists())
+
+    @override_settings(HABITS_REMINDER_MODE="periodic_task")
+    def test_schedule_outbox_broker_down(self):
+        """Тест недоступного брокера: привычка создается, outbox остается для запуска из beat"""
+        delay = patch("habits.tasks.drain_schedule_outbox.delay", side_effect=OperationalError("broker down"))
+        with delay, self.assertLogs("habits.services", "ERROR") as logs, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("habits:habit-create"), self.body, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("drain_schedule_outbox", logs.output[0])
+        self.assertTrue(ScheduleOutbox.objects.filter(habit_id=response.data["id"]).exists())
+
+    @override_settings(HABITS_REMINDER_MODE="periodic_task", HABITS_SCHEDULE_OUTBOX_BATCH=2)
+    def test_schedule_outbox(self):
+        """Тест outbox расписаний: запрос пишет только outbox, воркер пачками создает задачи"""
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("habits:habit-bulk-create"), [self.body] * 3 + [{**self.body, "period": 7}], format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse([query for query in queries if "django_celery_beat" in query["sql"]])
+        self.assertEqual(ScheduleOutbox.objects.count(), 4)
+        self.assertEqual([callback.__name__ for callback in callbacks].count("drain"), 1)
+
+        self.assertEqual(drain_schedule_outbox(), 4)
+        self.assertFalse(ScheduleOutbox.objects.exists())
+        self.assertEqual(PeriodicTask.objects.filter(name__startswith="Sending reminder").count(), 4)
+
+        # Повторная синхронизация той же привычки не создает дубль задачи
+        pk = response.data[0]["id"]
+        ScheduleOutbox.objects.bulk_create([ScheduleOutbox(habit_id=pk), ScheduleOutbox(habit_id=pk)])
+        self.assertEqual(drain_schedule_outbox(), 2)
+        self.assertEqual(PeriodicTask.objects.filter(name=f"Sending reminder {pk}").count(), 1)
+
+    @override_settings(HABITS_REMINDER_MODE="periodic_task")
+    def test_reconcile_reminders(self):
+        """Тест сверки задач напоминаний: лишние удаляются, недостающие создаются, чужие задачи не трогаются"""
+        pks = [self.client.post(reverse("habits:habit-create"), self.body, format="json").data["id"] for _ in range(3)]
+        drain_schedule_outbox()
+        schedule = CrontabSchedule.objects.create()
+        Habits.objects.filter(pk=pks[0]).delete()
+        Habits.objects.filter(pk=pks[1]).update(is_pleasant=True, reward=None)
+        PeriodicTask.objects.filter(name=f"Sending reminder {pks[2]}").delete()
+        PeriodicTask.objects.create(
+            crontab=schedule, name=f"Напоминание о привычке {pks[2]} - Читать", task="habits.tasks.send_habit_reminder"
+        )
+        PeriodicTask.objects.create(crontab=schedule, name="Очистка", task="celery.backend_cleanup")
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command("reconcile_reminders", stdout=out)
+
+        self.assertIn("Удалено задач без привычек: 3, создано недостающих: 1", out.getvalue())
+        self.assertIn("Задач у beat: 4 -> 2", out.getvalue())
+        self.assertEqual(
+            set(PeriodicTask.objects.values_list("name", flat=True)), {f"Sending reminder {pks[2]}", "Очистка"}
+        )
+        self.assertEqual(len([query for query in queries if query["sql"].startswith("DELETE")]), 1)
+
+        with override_settings(HABITS_REMINDER_MODE="dispatcher"):
+            result = reconcile_tasks()
+        self.assertEqual((result["deleted"], result["scheduled"]), (1, 1))
+        self.assertEqual(list(PeriodicTask.objects.values_list("name", flat=True)), ["Очистка"])
+        self.assertIsNotNone(Habits.objects.get(pk=pks[2]).next_fire_at)
+
+
+class ScheduleCacheTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        clear_schedule_cache()
+        self.user = User.objects.create(email="tg@user.ru", chat_id="100")
+
+    def test_create_tasks_skip_schedule_lookup(self):
+        """Тест создания задач без обращений к таблице расписаний после прогрева кэша"""
+        warm_schedule_cache()
+        habits = [
+            Habits.objects.create(user=self.user, place="Дом", action=f"Читать {period}", period=period, reward="Чай")
+            for period in (1, 7, 30)
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            create_tasks(habits)
+
+        self.assertFalse([query for query in queries if "crontabschedule" in query["sql"]])
+        self.assertEqual(PeriodicTask.objects.filter(crontab__day_of_week="1").count(), 1)
+        self.assertEqual(CrontabSchedule.objects.count(), 3)
+
+    def test_schedule_duplicates_and_eviction(self):
+        """Тест выбора расписания с наименьшим id среди дублей и сброса кэша при удалении"""
+        fields = {"minute": "0", "hour": "9", "day_of_month": "*", "month_of_year": "*", "day_of_week": "*"}
+        first = CrontabSchedule.objects.create(**fields)
+        CrontabSchedule.objects.create(**fields)
+
+        self.assertEqual(get_schedule_id("0 9 * * *"), first.pk)
+        with CaptureQueriesContext(connection) as queries:
+            get_schedule_id("0 9 * * *")
+        self.assertEqual(len(queries), 0)
+
+        first.delete()
+        self.assertNotEqual(get_schedule_id("0 9 * * *"), first.pk)
+        self.assertEqual(CrontabSchedule.objects.count(), 1)
+
+    @patch("habits.services.SCHEDULE_LOCK_TIMEOUT", 0.1)
+    def test_schedule_lock_not_released_by_waiter(self):
+        """Тест ожидания блокировки расписания: не дождавшийся писатель не снимает чужую блокировку"""
+        lock_key = SCHEDULE_LOCK_KEY.format(crontab="0_9_*_*_*", tz=settings.CELERY_TIMEZONE)
+        cache.set(lock_key, 1)
+
+        self.assertEqual(
+            find_or_create_schedule("0 9 * * *", settings.CELERY_TIMEZONE), CrontabSchedule.objects.get().pk
+        )
+        self.assertEqual(cache.get(lock_key), 1)
+
+        cache.delete(lock_key)
+        find_or_create_schedule("0 9 * * *", settings.CELERY_TIMEZONE)
+        self.assertIsNone(cache.get(lock_key))
+
+
+class HabitsBenchmarkTestCase(APITestCase):
+
+    def test_benchmark_report(self):
+        """Тест прогона всех сценариев нагрузки на маленькой базе"""
+        report = HabitsBenchmark(users=4, habits=40, requests=3, warmup=1).run()
+
+        self.assertEqual(tuple(report), WORKLOADS)
+        for result in report.values():
+            self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+            self.assertLessEqual(result["p95_ms"], result["p99_ms"])
+            self.assertGreater(result["rps"], 0)
+        self.assertEqual(Habits.objects.count(), 40 + 4)
+        self.assertGreater(report["render-orjson"]["mb_per_s"], 0)
+
+    def test_compare_with_baseline(self):
+        """Тест поиска регрессий: рост задержки сверх допуска и любой рост числа запросов"""
+        baseline = {"habit-list": {"p50_ms": 10, "p95_ms": 20, "queries": 2}}
+        report = {"habit-list": {"p50_ms": 12, "p95_ms": 30, "queries": 3}, "habit-create": {}}
+
+        self.assertEqual(
+            compare(report, baseline, tolerance=0.25),
+            ["habit-list: p95_ms 30.00 > 20.00", "habit-list: queries 3.00 > 2.00"],
+        )
+        self.assertEqual(compare(baseline, baseline, tolerance=0), [])
+
+
+class ORJSONTestCase(APITestCase):
+
+    def test_renderer_matches_drf(self):
+        """Тест рендерера на orjson: байт в байт как JSONRenderer DRF"""
+        data = {
+            "results": [{"id": 1, "action": "Читать\u2028книгу", "created_at": timezone.now(), "rate": 0.5}],
+            "day": timezone.now().date(),
+            "amount": Decimal("1.50"),
+            7: None,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            ORJSONRenderer().render(data, "application/json; indent=2"),
+            JSONRenderer().render(data, "application/json; indent=2"),
+        )
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_parser(self):
+        """Тест парсера на orjson: разбор тела и ошибка на некорректном JSON"""
+        parser = ORJSONParser()
+        self.assertEqual(
+            parser.parse(BytesIO('{"place": "Дом", "ids": [1, 2]}'.encode())), {"place": "Дом", "ids": [1, 2]}
+        )
+        for body in (b"{", b'{"value": NaN}'):
+            with self.assertRaises(ParseError):
+                parser.parse(BytesIO(body))
+
+        response = self.client.post(reverse("users:user_login"), b"{", content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("JSON parse error", response.json()["detail"])
+
+
+class SeedHabitsTestCase(APITestCase):
+
+    def test_seed_habits_command(self):
+        """Тест засеивания базы: пачки, общий хэш пароля и воспроизводимость по зерну"""
+        call_command("seed_habits", users=10, habits=50, seed=1, batch_size=7, stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Habits.objects.count(), 50)
+        self.assertEqual(User.objects.values("password").distinct().count(), 1)
+        self.assertTrue(User.objects.first().check_password(SEED_PASSWORD))
+        self.assertFalse(Habits.objects.filter(is_pleasant=False, next_fire_at__isnull=True).exists())
+
+        fields = ("place", "action", "is_pleasant", "period", "reward", "is_public")
+        first = list(Habits.objects.order_by("pk").values_list(*fields))
+        seed_habits(range(User.objects.first().pk, User.objects.last().pk + 1), 50, seed=1)
+        self.assertEqual(list(Habits.objects.order_by("pk").values_list(*fields)[50:]), first)
+
+        user = User.objects.create(email="new@user.ru")
+        self.assertGreater(user.pk, max(User.objects.exclude(pk=user.pk).values_list("pk", flat=True)))
+
+    def test_copy_rows_null_and_empty_values(self):
+        """Тест строк COPY: None пишется маркером NULL без кавычек, пустая строка остается пустой"""
+        users = get_copy_rows(User, [{"id": 1, "email": "a@seed.local", "password": "x", "chat_id": ""}])
+        habits = get_copy_rows(
+            Habits,
+            [{"id": 1, "user_id": 1, "place": "Дом, у окна", "action": "Читать", "is_pleasant": True, "reward": None}],
+        )
+
+        self.assertNotIn(f'"{COPY_NULL}"', users + habits)
+        user_row = dict(zip((field.attname for field in User._meta.concrete_fields), next(csv.reader([users]))))
+        self.assertEqual(user_row["last_login"], COPY_NULL)
+        self.assertEqual(user_row["chat_id"], "")
+        habit_row = dict(zip((field.attname for field in Habits._meta.concrete_fields), next(csv.reader([habits]))))
+        self.assertEqual(habit_row["place"], "Дом, у окна")
+        self.assertEqual(habit_row["reward"], COPY_NULL)
+        self.assertEqual(habit_row["next_fire_at"], COPY_NULL)
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_SLOW_REQUEST_MS=0, METRICS_TOKEN="")
+class RequestMetricsTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.user = User.objects.create(email="user@user.ru")
+        Habits.objects.create(user=self.user, place="Дом", action="Читать", reward="Чай")
+        self.client.force_authenticate(user=self.user)
+
+    def test_request_metrics(self):
+        """Тест сбора метрик по эндпоинту и лога медленных запросов с SQL"""
+        with self.assertLogs("config.metrics", level="WARNING") as logs:
+            self.client.get(reverse("habits:habit-list"))
+
+        stats = registry.snapshot()["GET /habits/"]
+        self.assertEqual((stats["duration"]["count"], stats["statuses"]), (1, {200: 1}))
+        self.assertGreater(stats["queries"], 0)
+        self.assertGreater(stats["serializer_time"], 0)
+        self.assertIn("Медленный запрос GET /habits/", logs.output[0])
+        self.assertIn('FROM "habits_habits"', logs.output[0])
+        # Время измеряется только у сериализаторов с TimedSerializerMixin, классы DRF не меняются
+        self.assertFalse(hasattr(BaseSerializer.data.fget, "__wrapped__"))
+
+    def test_prometheus_endpoint(self):
+        """Тест выдачи метрик всех процессов в текстовом формате Prometheus"""
+        with self.assertLogs("config.metrics", level="WARNING") as logs:
+            self.client.get(reverse("habits:habit-list"))
+        self.assertIn("Медленный запрос GET /habits/", logs.output[0])
+        # Снимок другого процесса веб-приложения, опубликованный в общий кэш
+        snapshot = registry.snapshot()
+        cache.set("metrics:http:other-1", snapshot)
+        cache.set("metrics:http:index", ["metrics:http:other-1"])
+
+        with self.assertLogs("config.metrics", level="WARNING") as logs:
+            response = self.client.get(reverse("metrics"))
+        self.assertIn("Медленный запрос GET /metrics", logs.output[0])
+
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4")
+        content = response.content.decode()
+        self.assertIn('http_requests_total{endpoint="GET /habits/",status="200"} 2', content)
+        self.assertIn('http_request_duration_seconds_count{endpoint="GET /habits/"} 2', content)
+        self.assertIn('http_request_db_queries_total{endpoint="GET /habits/"}', content)
+
+        # Middleware этого клиента уже создан, поэтому запрос все равно попадает в лог медленных
+        with override_settings(METRICS_ENABLED=False), self.assertLogs("config.metrics", level="WARNING"):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_prometheus_endpoint_access(self):
+        """Тест доступа к метрикам: по токену, а без него - только с локального адреса"""
+        url = reverse("metrics")
+        with self.assertLogs("config.metrics", level="WARNING") as logs:
+            self.assertEqual(self.client.get(url, REMOTE_ADDR="10.0.0.5").status_code, status.HTTP_403_FORBIDDEN)
+
+            with override_settings(METRICS_TOKEN="secret"):
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+                response = self.client.get(url, REMOTE_ADDR="10.0.0.5", HTTP_AUTHORIZATION="Bearer secret")
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(logs.output), 3)
+        self.assertTrue(all("Медленный запрос GET /metrics" in output for output in logs.output))
+
+
+class HabitCompletionTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email="user@user.ru")
+        self.habit = Habits.objects.create(user=self.user, place="Дом", action="Читать", reward="Чай")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("habits:habit-complete", args=(self.habit.pk,))
+        self.today = timezone.now().astimezone(ZoneInfo(self.user.timezone)).date()
+
+    def complete(self, days_ago):
+        return self.client.post(self.url, {"completed_on": self.today - timedelta(days=days_ago)}, format="json")
+
+    def test_complete_and_streaks(self):
+        """Тест отметок о выполнении: продолжение, повтор за день и обрыв серии"""
+        self.assertEqual(self.complete(4).status_code, status.HTTP_201_CREATED)
+        response = self.complete(3)
+        self.assertEqual((response.data["current_streak"], response.data["longest_streak"]), (0, 2))
+
+        response = self.complete(3)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(HabitCompletion.objects.filter(habit=self.habit).count(), 2)
+
+        response = self.client.post(self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["current_streak"], 1)
+        self.assertEqual(response.data["longest_streak"], 2)
+        self.assertEqual(response.data["completed_periods"], 3)
+        self.assertEqual(response.data["completion_rate"], 0.6)
+
+    def test_complete_validation(self):
+        """Тест отказа в отметке задним числом, в будущем и чужой привычки"""
+        self.complete(1)
+        self.assertEqual(self.complete(2).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.complete(-1).status_code, status.HTTP_400_BAD_REQUEST)
+
+        other = Habits.objects.create(user=User.objects.create(email="other@user.ru"), place="Дом", action="Бегать")
+        response = self.client.post(reverse("habits:habit-complete", args=(other.pk,)), format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_streak_constant_queries(self):
+        """Тест чтения статистики: число запросов не зависит от длины журнала"""
+        url = reverse("habits:habit-streak", args=(self.habit.pk,))
+        response = self.client.get(url)
+        self.assertEqual((response.data["current_streak"], response.data["completion_rate"]), (0, 0))
+
+        for days_ago in range(10, 0, -1):
+            self.complete(days_ago)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.data["current_streak"], 10)
+
+        self.habit.period = Habits.WEEKLY
+        self.habit.save()
+        self.assertEqual(self.client.get(url).data["completed_periods"], 10)
+
+
+class HabitStatsTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email="user@user.ru")
+        self.pleasant_habit = Habits.objects.create(user=self.user, place="Парк", action="Гулять", is_pleasant=True)
+        self.habit = Habits.objects.create(user=self.user, place="Дом", action="Читать", reward="Чай", is_public=True)
+        Habits.objects.create(user=User.objects.create(email="other@user.ru"), place="Офис", action="Бегать")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("habits:habit-stats")
+
+    def assert_stats(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = count_user_habits(self.user)
+        expected["useful"] = expected["total"] - expected["pleasant"]
+        self.assertEqual(response.json(), expected)
+        return response.json()
+
+    def test_stats_follow_changes(self):
+        """Тест статистики: счетчики обновляются при создании, изменении и удалении привычек"""
+        stats = self.assert_stats()
+        self.assertEqual((stats["total"], stats["pleasant"], stats["public"], stats["daily"]), (2, 1, 1, 2))
+
+        habit = {"place": "Зал", "action": "Бегать", "period": Habits.DAILY, "reward": "Чай"}
+        self.client.post(reverse("habits:habit-create"), habit)
+        self.client.patch(reverse("habits:habit-update", args=(self.habit.pk,)), {"period": Habits.WEEKLY})
+        self.assert_stats()
+
+        payload = [{"place": "Зал", "action": "Отжимания", "period": 30, "related_habit": self.pleasant_habit.pk}] * 3
+        self.client.post(reverse("habits:habit-bulk-create"), payload, format="json")
+        self.client.patch(
+            reverse("habits:habit-bulk-update"), [{"id": self.pleasant_habit.pk, "is_public": True}], format="json"
+        )
+        self.assert_stats()
+
+        self.client.delete(reverse("habits:habit-delete", args=(self.habit.pk,)))
+        ids = list(Habits.objects.filter(user=self.user, period=Habits.MONTHLY).values_list("pk", flat=True))
+        self.client.delete(reverse("habits:habit-bulk-delete"), {"ids": ids[:2]}, format="json")
+        stats = self.assert_stats()
+        self.assertEqual((stats["total"], stats["monthly"]), (3, 1))
+
+    def test_stats_row_missing_during_write(self):
+        """Тест статистики: изменение не теряется, пока строки нет или ее одновременно создает чтение"""
+        HabitStats.objects.filter(user=self.user).delete()
+        self.client.delete(reverse("habits:habit-delete", args=(self.pleasant_habit.pk,)))
+        self.assertEqual(HabitStats.objects.get(user=self.user).total, 1)
+
+        # Параллельное чтение посчитало привычки до удаления и создало строку раньше записи
+        HabitStats.objects.filter(user=self.user).delete()
+        stale = count_user_habits(self.user)
+
+        def create_concurrently(user_id):
+            HabitStats.objects.create(user_id=user_id, **stale)
+
+        with patch("habits.stats.create_user_stats", side_effect=create_concurrently):
+            self.client.delete(reverse("habits:habit-delete", args=(self.habit.pk,)))
+        self.assertEqual(self.assert_stats()["total"], 0)
+
+    def test_stats_deleted_with_user(self):
+        """Тест статистики: при удалении пользователя его строка не пересобирается"""
+        user_pk = self.user.pk
+        self.user.delete()
+        self.assertFalse(HabitStats.objects.filter(user_id=user_pk).exists())
+
+    def test_stats_single_query(self):
+        """Тест статистики: чтение - один запрос по первичному ключу"""
+        self.client.get(self.url)
+        seed_habits(range(self.user.pk, self.user.pk + 1), 50)
+        self.assertFalse(HabitStats.objects.filter(user=self.user).exists())
+
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.json()["total"], 52)
+
+
+class HabitSearchTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="user@user.ru")
+        self.other = User.objects.create(email="other@user.ru")
+        Habits.objects.create(user=self.user, place="Дом", action="Читать книгу", reward="Чай")
+        Habits.objects.create(user=self.user, place="Парк", action="Читать новости", reward="Чай", is_public=True)
+        Habits.objects.create(user=self.user, place="Дом", action="Отжиматься", reward="Чай")
+        Habits.objects.create(user=self.other, place="Библиотека", action="Читать", reward="Чай", is_public=True)
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, url, text):
+        response = self.client.get(url, {"search": text})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_search_own_habits(self):
+        """Тест поиска по своим привычкам: все слова ищутся по действию и месту"""
+        url = reverse("habits:habit-list")
+        self.assertEqual(self.search(url, "Читать")["count"], 2)
+        self.assertEqual([habit["action"] for habit in self.search(url, "Читать Дом")["results"]], ["Читать книгу"])
+        self.assertEqual(self.search(url, "Бегать")["results"], [])
+        self.assertNotIn("count", self.client.get(url, {"search": " "}).json())
+
+    def test_search_public_habits(self):
+        """Тест поиска по публичным привычкам всех пользователей"""
+        results = self.search(reverse("habits:public-habit-list"), "Читать")["results"]
+        self.assertEqual({habit["action"] for habit in results}, {"Читать", "Читать новости"})
+        self.assertEqual(self.search(reverse("habits:public-habit-list"), "Библиотека")["count"], 1)
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="user@user.ru", is_active=True)
+        self.habit = Habits.objects.create(user=self.user, place="Дом", action="Читать", reward="Чай")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.url = reverse("habits:habit-detail", args=(self.habit.pk,))
+
+    def test_read_single_query(self):
+        """Тест чтения с JWT: пользователь берется из кэша, остается один запрос за привычкой"""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["user"], self.user.pk)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("habits:habit-detail", args=(self.habit.pk + 1000,)))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_user_changes_reset_cache(self):
+        """Тест сброса кэша: деактивированный и удаленный пользователь не проходят аутентификацию"""
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = True
+        self.user.save()
+        response = self.client.post(
+            reverse("habits:habit-create"), {"place": "Парк", "action": "Бегать", "period": 1, "reward": "Чай"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Сохранение пользователя из кэша не затирает незагруженные поля
+        self.user.set_password("secret")
+        self.user.save()
+        user = CachedJWTAuthentication().get_user(AccessToken.for_user(self.user))
+        user.city = "Москва"
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.city, "Москва")
+        self.assertTrue(self.user.check_password("secret"))
+
+        self.user.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,16 +1,24 @@
 from django.urls import path
 
 from habits.apps import HabitsConfig
-from habits.views import (HabitCreateAPIView, HabitDestroyAPIView, HabitListAPIView, HabitRetrieveAPIView,
-                          HabitUpdateAPIView, PublicHabitListAPIView)
+from habits.views import (HabitBulkCreateAPIView, HabitBulkDestroyAPIView, HabitBulkUpdateAPIView,
+                          HabitCompleteAPIView, HabitCreateAPIView, HabitDestroyAPIView, HabitListAPIView,
+                          HabitRetrieveAPIView, HabitStatsAPIView, HabitStreakAPIView, HabitUpdateAPIView,
+                          PublicHabitListAPIView)
 
 app_name = HabitsConfig.name
 
 urlpatterns = [
     path("new", HabitCreateAPIView.as_view(), name="habit-create"),
+    path("bulk/new", HabitBulkCreateAPIView.as_view(), name="habit-bulk-create"),
+    path("bulk/update", HabitBulkUpdateAPIView.as_view(), name="habit-bulk-update"),
+    path("bulk/delete", HabitBulkDestroyAPIView.as_view(), name="habit-bulk-delete"),
     path("public-habits", PublicHabitListAPIView.as_view(), name="public-habit-list"),
+    path("stats", HabitStatsAPIView.as_view(), name="habit-stats"),
     path("", HabitListAPIView.as_view(), name="habit-list"),
     path("<int:pk>/", HabitRetrieveAPIView.as_view(), name="habit-detail"),
     path("<int:pk>/update", HabitUpdateAPIView.as_view(), name="habit-update"),
     path("<int:pk>/delete", HabitDestroyAPIView.as_view(), name="habit-delete"),
+    path("<int:pk>/complete", HabitCompleteAPIView.as_view(), name="habit-complete"),
+    path("<int:pk>/streak", HabitStreakAPIView.as_view(), name="habit-streak"),
 ]
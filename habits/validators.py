@@ -1,9 +1,31 @@
 from rest_framework import serializers
+from rest_framework.serializers import as_serializer_error
 
 from habits.models import Habits
 
 
+def to_pk(value) -> int | None:
+    """Приводит значение из запроса к первичному ключу, если это возможно."""
+    return int(value) if str(value).isdigit() else None
+
+
 class HabitValidator:
+    """Проверяет привычку по набору правил.
+
+    Правила работают с уже загруженными объектами (related_habit - экземпляр Habits)
+    и не обращаются к БД, поэтому список привычек проверяется через validate_many
+    с одним запросом на все связанные привычки.
+    """
+
+    rules = (
+        "validate_time_success",
+        "validate_related_habit",
+        "validate_reward_and_related",
+        "validate_pleasant_habit",
+        "validate_good_habit_requirements",
+        "validate_max_time_processing",
+    )
+
     def validate_time_success(self, attrs):
         """Проверяет, что время выполнения привычки не превышает 120 секунд."""
         if attrs.get("time_success", 0) > 120:
@@ -11,8 +33,8 @@ class HabitValidator:
 
     def validate_related_habit(self, attrs):
         """Проверяет, что в качестве связанной привычки выбрана только приятная привычка."""
-        if attrs.get("fk_habits"):
-            related_habit = Habits.objects.get(pk=attrs.get("fk_habits"))
+        related_habit = attrs.get("related_habit")
+        if related_habit:
             if not related_habit.is_pleasant:
                 raise serializers.ValidationError(
                     "В качестве связанной привычки можно выбрать только приятную привычку."
@@ -20,7 +42,7 @@ class HabitValidator:
 
     def validate_reward_and_related(self, attrs):
         """Проверяет, что не выбраны одновременно и вознаграждение и связанная привычка."""
-        if attrs.get("fk_habits") and attrs.get("reward"):
+        if attrs.get("related_habit") and attrs.get("reward"):
             raise serializers.ValidationError(
                 "Нельзя одновременно выбирать и связанную привычку и вознаграждение. Выберите что-то одно."
             )
@@ -34,7 +56,7 @@ class HabitValidator:
                 raise serializers.ValidationError("Приятная привычка не может иметь вознаграждения.")
 
             # Приятная привычка не должна быть связана с другой привычкой
-            if attrs.get("fk_habits"):
+            if attrs.get("related_habit"):
                 raise serializers.ValidationError("Приятная привычка не может быть связана с другой привычкой.")
 
             # Приятная привычка не должна иметь периодичности выполнения
@@ -46,7 +68,7 @@ class HabitValidator:
         либо связанную привычку, и имеет периодичность выполнения."""
         if not attrs.get("is_pleasant"):
             # Проверяем, что есть либо вознаграждение, либо связанная привычка
-            has_reward_or_related = attrs.get("reward") or attrs.get("fk_habits")
+            has_reward_or_related = attrs.get("reward") or attrs.get("related_habit")
 
             if not has_reward_or_related:
                 raise serializers.ValidationError(
@@ -65,9 +87,36 @@ class HabitValidator:
 
     def __call__(self, attrs):
         """Основной метод валидации, который вызывает все проверки."""
-        self.validate_time_success(attrs)
-        self.validate_related_habit(attrs)
-        self.validate_reward_and_related(attrs)
-        self.validate_pleasant_habit(attrs)
-        self.validate_good_habit_requirements(attrs)
-        self.validate_max_time_processing(attrs)
+        for rule in self.rules:
+            getattr(self, rule)(attrs)
+
+    @staticmethod
+    def get_related_habits(items) -> dict[int, Habits]:
+        """Загружает одним запросом связанные привычки, указанные по pk в списке данных."""
+        pks = {to_pk(item.get("related_habit")) for item in items if isinstance(item, dict)}
+        return Habits.objects.in_bulk(pks - {None})
+
+    def validate_many(self, items, related_habits: dict[int, Habits] | None = None) -> list[dict]:
+        """Проверяет список данных привычек и возвращает ошибки по каждому элементу ({} - ошибок нет).
+
+        related_habit в элементах может быть задан pk: объект берется из related_habits,
+        а если словарь не передан - загружается одним запросом на весь список.
+        """
+        if related_habits is None:
+            related_habits = self.get_related_habits(items)
+
+        errors = []
+        for attrs in items:
+            related_habit = attrs.get("related_habit")
+            if related_habit is not None and not isinstance(related_habit, Habits):
+                attrs = {**attrs, "related_habit": related_habits.get(to_pk(related_habit))}
+                if attrs["related_habit"] is None:
+                    errors.append({"related_habit": [f"Привычка {related_habit} не найдена."]})
+                    continue
+            try:
+                self(attrs)
+            except serializers.ValidationError as exc:
+                errors.append(as_serializer_error(exc))
+            else:
+                errors.append({})
+        return errors
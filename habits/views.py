@@ -1,72 +1,262 @@
-from django.shortcuts import get_object_or_404, render
-from django_celery_beat.models import PeriodicTask
-from rest_framework import generics
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.shortcuts import render
+from django.utils.http import parse_etags
+from rest_framework import generics, serializers, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 
-from habits.models import Habits
-from habits.paginators import HabitsPagination
-from habits.serializers import HabitsSerializer, PublicHabitsSerializer
-from habits.services import create_replacements, create_schedule, create_task, make_replacements
-from users.permissions import IsUser
+from config.renderers import ORJSONRenderer
+from habits.cache import get_public_feed_key, set_public_feed_page
+from habits.models import Habits, HabitStreak
+from habits.paginators import HabitsCursorPagination, HabitsPagination
+from habits.search import HabitSearchFilter, get_search_text
+from habits.serializers import (HabitCompletionSerializer, HabitsSerializer, HabitStatsSerializer,
+                                HabitStreakSerializer, HabitValuesSerializer, PublicHabitsSerializer,
+                                get_readable_fields)
+from habits.services import (REMINDER_MODE_DISPATCHER, bulk_delete_habits, complete_habit, enqueue_tasks_sync,
+                             get_habit_next_fire_at, get_user_today)
+from habits.stats import get_user_stats
 
 
 class HabitCreateAPIView(generics.CreateAPIView):
     serializer_class = HabitsSerializer
 
     def perform_create(self, serializer):
-        habit = serializer.save(user=self.request.user)
-        if not habit.is_pleasant:
-            replacements = create_replacements(habit)
-            habit.frequency = make_replacements(habit.frequency, replacements)
-            habit.save()
+        attrs = serializer.validated_data
+        if settings.HABITS_REMINDER_MODE == REMINDER_MODE_DISPATCHER:
+            # Расписание считается до записи, чтобы привычка сохранялась одним INSERT
+            next_fire_at = get_habit_next_fire_at(
+                attrs.get("is_pleasant", False), attrs.get("period", Habits.DAILY), user=self.request.user
+            )
+            serializer.save(user=self.request.user, next_fire_at=next_fire_at)
+        else:
+            with transaction.atomic():
+                habit = serializer.save(user=self.request.user)
+                enqueue_tasks_sync([habit.pk])
 
-            if habit.user.tg_chat_id:
-                schedule = create_schedule(habit.frequency)
-                create_task(schedule, habit)
 
+class HabitSearchMixin:
+    """Поиск по параметру search: найденное упорядочено по релевантности, поэтому листается по номерам страниц."""
 
-class PublicHabitListAPIView(generics.ListAPIView):
+    filter_backends = (HabitSearchFilter,)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            self._paginator = HabitsPagination() if get_search_text(self.request) else self.pagination_class()
+        return self._paginator
+
+
+class HabitValuesListMixin:
+    """Список собирается быстрым сериализатором из строк .values(), параметр fields ограничивает набор полей."""
+
+    fields_param = "fields"
+    # Колонки, по которым листаются страницы, выбираются всегда
+    pagination_fields = ("id", "created_at")
+
+    def get_list_fields(self) -> tuple[str, ...]:
+        available = get_readable_fields(self.get_serializer_class())
+        requested = self.request.query_params.get(self.fields_param, "")
+        fields = tuple(dict.fromkeys(name.strip() for name in requested.split(",") if name.strip()))
+        unknown = [name for name in fields if name not in available]
+        if unknown:
+            raise ValidationError(
+                {self.fields_param: f"Неизвестные поля: {', '.join(unknown)}. Доступны: {', '.join(available)}."}
+            )
+        return fields or tuple(available)
+
+    def list(self, request, *args, **kwargs):
+        fields = self.get_list_fields()
+        queryset = self.filter_queryset(self.get_queryset()).values(*dict.fromkeys(fields + self.pagination_fields))
+        page = self.paginate_queryset(queryset)
+        serializer = HabitValuesSerializer(
+            queryset if page is None else page,
+            many=True,
+            source_serializer=self.get_serializer_class(),
+            fields=fields,
+        )
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+
+class PublicHabitListAPIView(HabitSearchMixin, HabitValuesListMixin, generics.ListAPIView):
     serializer_class = PublicHabitsSerializer
+    pagination_class = HabitsCursorPagination
 
     def get_queryset(self):
-        return Habits.objects.filter(is_public=True)
+        return Habits.objects.filter(is_public=True).only(*PublicHabitsSerializer.Meta.fields, "created_at")
 
+    def list(self, request, *args, **kwargs):
+        """Отдает страницу ленты из кэша, поддерживая условные запросы по ETag."""
+        key = get_public_feed_key(request)
+        page = cache.get(key)
+        if page is None:
+            response = super().list(request, *args, **kwargs)
+            page = set_public_feed_page(key, ORJSONRenderer().render(response.data))
 
-class HabitListAPIView(generics.ListAPIView):
+        etag, content = page
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type="application/json")
+        response["ETag"] = etag
+        return response
+
+
+class HabitListAPIView(HabitSearchMixin, HabitValuesListMixin, generics.ListAPIView):
     serializer_class = HabitsSerializer
-    pagination_class = HabitsPagination
+    pagination_class = HabitsCursorPagination
 
     def get_queryset(self):
         return Habits.objects.filter(user=self.request.user)
 
 
 class HabitRetrieveAPIView(generics.RetrieveAPIView):
-    queryset = Habits.objects.all()
     serializer_class = HabitsSerializer
-    permission_classes = (IsUser,)
+
+    def get_queryset(self):
+        # Доступ проверяется в самом запросе: своя или публичная привычка, иначе 404
+        return Habits.objects.filter(Q(user=self.request.user) | Q(is_public=True))
 
 
 class HabitUpdateAPIView(generics.UpdateAPIView):
-    queryset = Habits.objects.all()
     serializer_class = HabitsSerializer
-    permission_classes = (IsUser,)
 
-    def perform_update(self, serializer):
-        habit = serializer.save(user=self.request.user)
-        if not habit.is_pleasant:
-            replacements = create_replacements(habit)
-            habit.frequency = make_replacements(habit.frequency, replacements)
-            habit.save()
+    def get_queryset(self):
+        return Habits.objects.filter(user=self.request.user)
 
-            if habit.user.tg_chat_id:
-                task = get_object_or_404(PeriodicTask, name=f"Sending reminder {habit.pk}")
-                schedule = create_schedule(habit.frequency)
-                if task:
-                    task.enabled = False
-                    task.delete()
-                create_task(schedule, habit)
+    def perform_update(self, serializer):
+        habit, attrs = serializer.instance, serializer.validated_data
+        # Расписание зависит только от периодичности и типа привычки, остальные правки его не трогают
+        rescheduled = (attrs["is_pleasant"], attrs["period"]) != (habit.is_pleasant, habit.period)
+        if settings.HABITS_REMINDER_MODE == REMINDER_MODE_DISPATCHER:
+            if rescheduled:
+                serializer.save(
+                    next_fire_at=get_habit_next_fire_at(attrs["is_pleasant"], attrs["period"], user=self.request.user)
+                )
+            else:
+                serializer.save()
+        else:
+            with transaction.atomic():
+                habit = serializer.save()
+                if rescheduled:
+                    enqueue_tasks_sync([habit.pk])
 
 
 class HabitDestroyAPIView(generics.DestroyAPIView):
-    queryset = Habits.objects.all()
-    permission_classes = (IsUser,)
     serializer_class = HabitsSerializer
+
+    def get_queryset(self):
+        return Habits.objects.filter(user=self.request.user)
+
+    def destroy(self, request, *args, **kwargs):
+        """Удаляет привычку владельца через bulk_delete_habits, минуя get_object и проверку прав на объект.
+
+        Само удаление идет через Collector: сигналы Habits и связи related_habit требуют выборки строк,
+        каскадов и обновления статистики, всего 8 запросов.
+        """
+        if not bulk_delete_habits(self.get_queryset().filter(pk=kwargs["pk"])):
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class HabitBulkCreateAPIView(generics.CreateAPIView):
+    """Создание списка привычек одним запросом."""
+
+    serializer_class = HabitsSerializer
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, many=True, max_length=settings.HABITS_BULK_MAX_SIZE, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class HabitBulkUpdateAPIView(generics.GenericAPIView):
+    """Частичное обновление списка своих привычек, каждый элемент содержит id."""
+
+    serializer_class = HabitsSerializer
+
+    def get_queryset(self):
+        return Habits.objects.filter(user=self.request.user).select_related("user", "related_habit")
+
+    def patch(self, request, *args, **kwargs):
+        ids = (
+            [item.get("id") for item in request.data if isinstance(item, dict)]
+            if isinstance(request.data, list)
+            else []
+        )
+        instance = self.get_queryset().in_bulk([pk for pk in ids if str(pk).isdigit()])
+        serializer = self.get_serializer(
+            instance, data=request.data, many=True, partial=True, max_length=settings.HABITS_BULK_MAX_SIZE
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+
+class HabitBulkDestroyAPIView(generics.GenericAPIView):
+    """Удаление списка своих привычек по id."""
+
+    class BulkDestroySerializer(serializers.Serializer):
+        ids = serializers.ListField(child=serializers.IntegerField(), max_length=settings.HABITS_BULK_MAX_SIZE)
+
+    serializer_class = BulkDestroySerializer
+
+    def get_queryset(self):
+        return Habits.objects.filter(user=self.request.user)
+
+    def delete(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        bulk_delete_habits(self.get_queryset().filter(pk__in=serializer.validated_data["ids"]))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class HabitCompleteAPIView(generics.GenericAPIView):
+    """Отметка о выполнении своей привычки, возвращает обновленную статистику."""
+
+    serializer_class = HabitCompletionSerializer
+
+    def get_queryset(self):
+        return Habits.objects.filter(user=self.request.user).select_related("user")
+
+    def post(self, request, *args, **kwargs):
+        habit = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        streak, created = complete_habit(habit, serializer.validated_data["completed_on"])
+        return Response(
+            HabitStreakSerializer(streak).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+class HabitStreakAPIView(generics.RetrieveAPIView):
+    """Статистика выполнения своей привычки: текущая и лучшая серии, доля выполненных периодов."""
+
+    serializer_class = HabitStreakSerializer
+
+    def get_queryset(self):
+        return Habits.objects.filter(user=self.request.user).select_related("user", "streak")
+
+    def get_object(self):
+        habit = super().get_object()
+        try:
+            return habit.streak
+        except HabitStreak.DoesNotExist:
+            return HabitStreak(habit=habit, started_on=get_user_today(habit.user))
+
+
+class HabitStatsAPIView(generics.RetrieveAPIView):
+    """Статистика привычек текущего пользователя: всего, по видам и периодичности."""
+
+    serializer_class = HabitStatsSerializer
+
+    def get_object(self):
+        return get_user_stats(self.request.user)
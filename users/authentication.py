@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import User
+
+AUTH_USER_KEY = "users:auth:{pk}"
+# Поля, которых хватает для проверки доступа и работы с привычками; остальные догружаются при обращении
+CACHED_FIELDS = {"id", "email", "is_active", "is_staff", "is_superuser", "chat_id", "timezone", "reminder_time"}
+# Model.from_db ожидает значения в порядке полей модели
+AUTH_USER_FIELDS = tuple(field.attname for field in User._meta.concrete_fields if field.attname in CACHED_FIELDS)
+
+_auth_users: dict[int, tuple[float, tuple]] = {}
+
+
+def get_auth_user_values(pk: int) -> tuple | None:
+    """Возвращает значения AUTH_USER_FIELDS пользователя, обращаясь к базе только при промахе обоих кэшей.
+
+    Кэш процесса живет AUTH_USER_LOCAL_CACHE_TTL секунд, общий кэш (Redis) - AUTH_USER_CACHE_TTL
+    и сбрасывается при сохранении и удалении пользователя.
+    """
+    now = time.monotonic()
+    cached = _auth_users.get(pk)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    values = cache.get(AUTH_USER_KEY.format(pk=pk))
+    if values is None:
+        values = User.objects.filter(pk=pk).values_list(*AUTH_USER_FIELDS).first()
+        if values is None:
+            return None
+        cache.set(AUTH_USER_KEY.format(pk=pk), values, timeout=settings.AUTH_USER_CACHE_TTL)
+    _auth_users[pk] = (now + settings.AUTH_USER_LOCAL_CACHE_TTL, values)
+    return values
+
+
+def clear_auth_user_cache(pk: int) -> None:
+    cache.delete(AUTH_USER_KEY.format(pk=pk))
+    _auth_users.pop(pk, None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация без запроса пользователя к базе на каждый запрос.
+
+    id берется из токена, а минимальный набор полей пользователя - из кэша. Пользователь
+    собирается через from_db с отложенными остальными полями, поэтому его можно назначать
+    в связи, а сохранение не затронет незагруженные поля (например, пароль).
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Проверке отзыва нужен хэш пароля, его в кэше нет
+            return super().get_user(validated_token)
+        try:
+            pk = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        values = get_auth_user_values(pk)
+        if values is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        user = User.from_db(User.objects.db, AUTH_USER_FIELDS, values)
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:36
+
+import datetime
+
+from django.db import migrations, models
+
+import users.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="reminder_time",
+            field=models.TimeField(
+                default=datetime.time(9, 0),
+                help_text="Локальное время получения напоминаний",
+                verbose_name="Время напоминаний",
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="timezone",
+            field=models.CharField(
+                default="Europe/Moscow",
+                help_text="Часовой пояс IANA, например Europe/Moscow",
+                max_length=63,
+                validators=[users.validators.validate_timezone],
+                verbose_name="Часовой пояс",
+            ),
+        ),
+    ]
@@ -1,6 +1,11 @@
+from datetime import time
+
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from users.validators import validate_timezone
+
 
 class User(AbstractUser):
     """
@@ -14,6 +19,8 @@ class User(AbstractUser):
     phone (CharField): Номер телефона пользователя. Максимум 15 символов.
     city (CharField): Город проживания пользователя. Максимум 50 символов.
     chat_id (CharField): Номер пользователя в телеграмм
+    timezone (CharField): Часовой пояс пользователя в формате IANA, например Europe/Moscow.
+    reminder_time (TimeField): Время, в которое пользователь хочет получать напоминания.
     avatar (ImageField): Аватар пользователя. Загружается в папку 'users/avatar'.
     """
 
@@ -24,6 +31,16 @@ class User(AbstractUser):
     city = models.CharField(max_length=50, verbose_name="Город")
     chat_id = models.CharField(max_length=50, verbose_name="ID номер чата в телеграм")
     avatar = models.ImageField(upload_to="users/avatar", verbose_name="Аватар")
+    timezone = models.CharField(
+        max_length=63,
+        default=settings.TIME_ZONE,
+        validators=[validate_timezone],
+        verbose_name="Часовой пояс",
+        help_text="Часовой пояс IANA, например Europe/Moscow",
+    )
+    reminder_time = models.TimeField(
+        default=time(9, 0), verbose_name="Время напоминаний", help_text="Локальное время получения напоминаний"
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -1,7 +0,0 @@
-from rest_framework.permissions import BasePermission
-
-
-class IsUser(BasePermission):
-
-    def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
@@ -1,10 +1,11 @@
 from rest_framework import serializers
 
+from config.metrics import TimedSerializerMixin
 from users.models import User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = User
-        fields = ["id", "email", "password", "username", "chat_id"]
+        fields = ["id", "email", "password", "username", "chat_id", "timezone", "reminder_time"]
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.authentication import clear_auth_user_cache
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reset_auth_user_cache(sender, instance, **kwargs):
+    """Сбрасывает закэшированные для аутентификации поля пользователя."""
+    clear_auth_user_cache(instance.pk)
@@ -0,0 +1,11 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.exceptions import ValidationError
+
+
+def validate_timezone(value: str) -> None:
+    """Проверяет, что значение - известный часовой пояс IANA."""
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f"Неизвестный часовой пояс: {value}")